@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Бенчмарк движка: партий в секунду, задержка каждой фазы и расход памяти.
+
+    python bench/bench_engine.py                         # просто отчёт
+    python bench/bench_engine.py --save base.json        # запомнить результат
+    python bench/bench_engine.py --compare base.json     # код выхода 1 при регрессии
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mafia_engine import MafiaGame  # noqa: E402
+from mafia_engine.simulator import play_day, play_game, play_night, random_policy, simulate  # noqa: E402
+
+
+def bench_throughput(games, seed):
+    started = time.perf_counter()
+    simulate(games, seed=seed)
+    return games / (time.perf_counter() - started)
+
+
+def bench_phases(games, seed):
+    """Среднее время (мкс) каждой фазы по games партиям на 12 игроков."""
+    rng = random.Random(seed)
+    random.seed(seed)
+    totals = {'start_game': 0, 'night': 0, 'day': 0, 'check_winner': 0}
+    counts = dict.fromkeys(totals, 0)
+    clock = time.perf_counter_ns
+
+    def timed(name, fn, *args):
+        t = clock()
+        result = fn(*args)
+        totals[name] += clock() - t
+        counts[name] += 1
+        return result
+
+    for _ in range(games):
+        game = MafiaGame(-1, 1)
+        for uid in range(1, 13):
+            game.add_player(uid, f'bot{uid}')
+        timed('start_game', game.start_game)
+        for _ in range(50):
+            timed('night', play_night, game, random_policy, rng)
+            if timed('check_winner', game.check_winner):
+                break
+            timed('day', play_day, game, random_policy, rng)
+            if timed('check_winner', game.check_winner):
+                break
+        game.release()
+    return {name: totals[name] / counts[name] / 1000 for name in totals}
+
+
+def bench_allocations(games, seed):
+    """Пиковая память одной партии (байты) и блоки, оставшиеся после всех партий (утечки)."""
+    rng = random.Random(seed)
+    random.seed(seed)
+    tracemalloc.start()
+    blocks_before = sys.getallocatedblocks()
+    peak = 0
+    for _ in range(games):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        play_game(rng.randint(4, 20), random_policy, rng)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    leaked = sys.getallocatedblocks() - blocks_before
+    tracemalloc.stop()
+    return peak, leaked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--games', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save', help="сохранить результат в JSON")
+    parser.add_argument('--compare', help="сравнить с сохранённым результатом")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="допустимое ухудшение (доля)")
+    args = parser.parse_args()
+
+    result = {
+        'games_per_sec': bench_throughput(args.games, args.seed),
+        'phase_us': bench_phases(args.games, args.seed),
+    }
+    result['peak_bytes_per_game'], result['leaked_blocks'] = bench_allocations(max(1, args.games // 10), args.seed)
+
+    print(f"партий/с:            {result['games_per_sec']:.0f}")
+    for name, us in result['phase_us'].items():
+        print(f"{name + ', мкс:':<21}{us:.2f}")
+    print(f"пик памяти партии:   {result['peak_bytes_per_game'] / 1024:.1f} КБ")
+    print(f"утекло блоков:       {result['leaked_blocks']}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            base = json.load(f)
+        limit = 1 + args.tolerance
+        regressions = []
+        if result['games_per_sec'] * limit < base['games_per_sec']:
+            regressions.append('games_per_sec')
+        for name, us in result['phase_us'].items():
+            if us > base['phase_us'][name] * limit:
+                regressions.append(name)
+        if result['peak_bytes_per_game'] > base['peak_bytes_per_game'] * limit:
+            regressions.append('peak_bytes_per_game')
+        if result['leaked_blocks'] > max(base['leaked_blocks'], 0) + 100:
+            regressions.append('leaked_blocks')
+        if regressions:
+            print("❌ Регрессия: " + ", ".join(regressions))
+            sys.exit(1)
+        print("✅ Регрессий нет")
+
+
+if __name__ == '__main__':
+    main()
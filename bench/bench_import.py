@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Время импорта по python -X importtime: движок должен грузиться за миллисекунды и без aiogram.
+
+    python bench/bench_import.py
+    python bench/bench_import.py --limit-ms 20     # код выхода 1, если движок грузится дольше
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ('mafia_engine', 'mafia_bot', 'mafia_bot.handlers', 'mafia_bot.app')
+
+
+def import_ms(module, runs):
+    """Лучшее из runs суммарное время импорта модуля (мс) в свежем интерпретаторе."""
+    best = None
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                cwd=ROOT, capture_output=True, text=True, check=True)
+        for line in result.stderr.splitlines():
+            parts = line.split('|')
+            if len(parts) == 3 and parts[2].strip() == module:
+                us = int(parts[1])
+        best = us if best is None else min(best, us)
+    return best / 1000
+
+
+def pulls_aiogram(module):
+    code = f'import sys, {module}; sys.exit(1 if "aiogram" in sys.modules else 0)'
+    return subprocess.run([sys.executable, '-c', code], cwd=ROOT).returncode != 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--limit-ms', type=float, help="допустимое время импорта mafia_engine")
+    args = parser.parse_args()
+
+    for module in MODULES:
+        note = ", тянет aiogram" if pulls_aiogram(module) else ""
+        print(f"{module:<20} {import_ms(module, args.runs):8.2f} мс{note}")
+
+    failed = False
+    if pulls_aiogram('mafia_engine'):
+        print("❌ mafia_engine импортирует aiogram")
+        failed = True
+    if args.limit_ms is not None and import_ms('mafia_engine', args.runs) > args.limit_ms:
+        print(f"❌ mafia_engine грузится дольше {args.limit_ms} мс")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Бенчмарк хранилищ игр: запись снимков пачками и восстановление всех игр.
+
+Сравнивает словарь в памяти (как хранятся живые игры сейчас) с MemoryGameStore,
+SQLiteGameStore и RedisGameStore. Redis по умолчанию — fakeredis в этом же
+процессе; --redis-url направляет тест на настоящий сервер.
+
+    python bench/bench_store.py --games 2000 --rounds 5
+    python bench/bench_store.py --redis-url redis://localhost:6379/15
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mafia_bot.storage import GameStore, MemoryGameStore, RedisGameStore, SQLiteGameStore  # noqa: E402
+from mafia_engine import MafiaGame  # noqa: E402
+
+
+def make_games(count, seed):
+    # Раздача зависит только от seed игры, а их берём из --seed: прогоны воспроизводимы
+    rng = random.Random(seed)
+    games = []
+    for i in range(count):
+        game = MafiaGame(-1000000 - i, 1, rng.getrandbits(63))
+        for uid in range(12):
+            game.add_player(i * 100 + uid + 1, f'p{uid}')
+        game.start_game()
+        games.append(game)
+    return games
+
+
+class DictStore(GameStore):
+    """Нынешний вариант: игры просто лежат в словаре процесса."""
+
+    def __init__(self):
+        self.data = {}
+
+    def save(self, game):
+        self.data[game.chat_id] = game
+
+    async def load_all(self):
+        return list(self.data.values())
+
+
+async def bench(store, games, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for game in games:
+            store.save(game)
+        await store.flush()
+    saves = len(games) * rounds / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    snapshots = await store.load_all()
+    if snapshots and isinstance(snapshots[0], dict):
+        for data in snapshots:
+            MafiaGame.from_dict(data)
+    loads = len(snapshots) / (time.perf_counter() - started)
+    await store.close()
+    assert len(snapshots) == len(games), (len(snapshots), len(games))
+    return saves, loads
+
+
+def redis_client(url):
+    if url:
+        import redis.asyncio as aioredis
+        return aioredis.from_url(url)
+    try:
+        import fakeredis
+    except ImportError:
+        return None
+    return fakeredis.aioredis.FakeRedis()
+
+
+async def main_async(args):
+    games = make_games(args.games, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        stores = [
+            ('dict', DictStore()),
+            ('memory', MemoryGameStore()),
+            ('sqlite', SQLiteGameStore(os.path.join(tmp, 'bench.sqlite3'))),
+        ]
+        client = redis_client(args.redis_url)
+        if client is None:
+            print("redis: пропущен (нет ни --redis-url, ни пакета fakeredis)")
+        else:
+            await client.flushdb()
+            stores.append(('redis', RedisGameStore(client, prefix='bench')))
+        for name, store in stores:
+            saves, loads = await bench(store, games, args.rounds)
+            print(f"{name:<8} запись: {saves:>10.0f} игр/с   восстановление: {loads:>10.0f} игр/с")
+    for game in games:
+        game.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--games', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=5, help="сколько раз записать каждую игру")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--redis-url', help="настоящий Redis (база будет очищена!)")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
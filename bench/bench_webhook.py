@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Нагрузка на webhook: POST синтетических апдейтов и задержка ответа сервера.
+
+Сервер запускается локально без регистрации у Telegram (WEBHOOK_URL не задан):
+
+    MODE=webhook WEBHOOK_SECRET=s BOT_TOKEN=1:x python mafia.py
+    python bench/bench_webhook.py --url http://127.0.0.1:8080/webhook --secret s --updates 20000
+"""
+
+import argparse
+import asyncio
+import time
+
+import aiohttp
+
+
+def make_update(update_id, chats):
+    chat_id = -1000000 - update_id % chats
+    return {'update_id': update_id, 'message': {
+        'message_id': update_id, 'date': int(time.time()), 'text': f'сообщение {update_id}',
+        'chat': {'id': chat_id, 'type': 'group'},
+        'from': {'id': 1000 + update_id % 50, 'is_bot': False, 'first_name': 'bench'}}}
+
+
+async def run(url, secret, updates, concurrency, chats):
+    headers = {'X-Telegram-Bot-Api-Secret-Token': secret} if secret else {}
+    latencies = []
+    statuses = {}
+    next_id = iter(range(1, updates + 1))
+
+    async def client(session):
+        for update_id in next_id:
+            started = time.perf_counter()
+            async with session.post(url, json=make_update(update_id, chats), headers=headers) as resp:
+                await resp.read()
+            latencies.append(time.perf_counter() - started)
+            statuses[resp.status] = statuses.get(resp.status, 0) + 1
+
+    started = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(client(session) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"апдейтов: {updates} за {elapsed:.2f} с ({updates / elapsed:.0f}/с)")
+    print(f"задержка p50: {latencies[len(latencies) // 2] * 1000:.2f} мс, "
+          f"p99: {latencies[int(len(latencies) * 0.99)] * 1000:.2f} мс")
+    print(f"ответы: {statuses}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8080/webhook')
+    parser.add_argument('--secret')
+    parser.add_argument('--updates', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--chats', type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.secret, args.updates, args.concurrency, args.chats))
+
+
+if __name__ == '__main__':
+    main()
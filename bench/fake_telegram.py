@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Поддельный сервер Bot API для нагрузочных тестов: отвечает как Telegram, но локально.
+
+Понимает методы, которыми пользуется бот (sendMessage, editMessageText,
+answerCallbackQuery, deleteWebhook, getMe), остальные просто подтверждает.
+Задержка ответа и доля ответов 429 (Too Many Requests) настраиваются.
+
+    python bench/fake_telegram.py --port 8081 --latency 0.05 --rate-429 0.01
+    TELEGRAM_API_URL=http://127.0.0.1:8081 BOT_TOKEN=1:x python mafia.py
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from aiohttp import web
+
+LIMITED_METHODS = ('sendMessage', 'editMessageText')  # методы, на которые Telegram отвечает 429
+
+
+class FakeTelegram:
+    def __init__(self, latency=0.0, jitter=0.0, rate_429=0.0, retry_after=1, limited=LIMITED_METHODS, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.limited = set(limited)
+        self.rng = random.Random(seed)
+        self.calls = {}  # метод -> успешных вызовов
+        self.rejected = 0
+        self.message_id = 0
+        self.runner = None
+        self.app = web.Application()
+        self.app.router.add_post('/bot{token}/{method}', self.handle)
+
+    async def handle(self, request):
+        method = request.match_info['method']
+        data = await request.post()
+        delay = self.latency + (self.rng.uniform(-self.jitter, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if method in self.limited and self.rate_429 and self.rng.random() < self.rate_429:
+            self.rejected += 1
+            return web.json_response({'ok': False, 'error_code': 429,
+                                      'description': f"Too Many Requests: retry after {self.retry_after}",
+                                      'parameters': {'retry_after': self.retry_after}}, status=429)
+        self.calls[method] = self.calls.get(method, 0) + 1
+        return web.json_response({'ok': True, 'result': self.result(method, data)})
+
+    def result(self, method, data):
+        if method == 'getMe':
+            return {'id': 1, 'is_bot': True, 'first_name': 'Fake', 'username': 'fake_mafia_bot'}
+        if method == 'sendMessage':
+            self.message_id += 1
+            chat_id = int(data['chat_id'])
+            return {'message_id': self.message_id, 'date': int(time.time()), 'text': data.get('text', ''),
+                    'chat': {'id': chat_id, 'type': 'private' if chat_id > 0 else 'group'}}
+        return True
+
+    def total(self):
+        return sum(self.calls.values())
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Поднимает сервер и возвращает его адрес для TelegramAPIServer.from_base()."""
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f'http://{host}:{port}'
+
+    async def close(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+
+async def serve_forever(args):
+    server = FakeTelegram(args.latency, args.jitter, args.rate_429, args.retry_after)
+    url = await server.start(args.host, args.port)
+    print(f"Bot API: {url} (задержка {args.latency} с, 429: {args.rate_429:.1%})")
+    try:
+        while True:
+            await asyncio.sleep(10)
+            print(f"вызовов: {server.total()}, 429: {server.rejected}, по методам: {server.calls}")
+    finally:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.0, help="задержка ответа, с")
+    parser.add_argument('--jitter', type=float, default=0.0, help="разброс задержки ±, с")
+    parser.add_argument('--rate-429', type=float, default=0.0, help="доля ответов 429 на отправку и правку")
+    parser.add_argument('--retry-after', type=int, default=1)
+    try:
+        asyncio.run(serve_forever(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Нагрузочный тест бота целиком: тысячи виртуальных чатов против поддельного Bot API.
+
+Бот (create_app) ходит в bench/fake_telegram.py по HTTP, как ходил бы в Telegram.
+Каждый виртуальный чат создаёт игру, набирает игроков, начинает её, а игроки жмут
+ночные кнопки и голосуют, пока игра не закончится. В конце печатаются задержка
+обработки апдейтов (p50/p99, вместе с ожиданием в очереди чата), вызовы Bot API
+в секунду и память на одну игру.
+
+    python bench/load_test.py --chats 2000 --players 10 --latency 0.03 --rate-429 0.005
+
+Лимиты Telegram в SendQueue по умолчанию сняты, чтобы мерить сам бот;
+--telegram-limits оставляет их (и тогда скорость упирается в них).
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('NIGHT_TIMEOUT', '600')  # фазы заканчиваются ходами; зависшие добивает сам тест
+os.environ.setdefault('DAY_TIMEOUT', '600')
+
+from aiogram import Bot, Dispatcher  # noqa: E402
+from aiogram.bot.api import TelegramAPIServer  # noqa: E402
+
+from fake_telegram import FakeTelegram  # noqa: E402
+from mafia_bot import config, handlers  # noqa: E402
+from mafia_bot.app import create_app  # noqa: E402
+from mafia_bot.storage import GameStore  # noqa: E402
+from stress_actors import Updates  # noqa: E402
+
+
+def rss():
+    """Текущая память процесса (байт)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+class Driver:
+    def __init__(self, dp, args):
+        self.dp = dp
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.updates = Updates()
+        self.latencies = []
+        self.finished = 0
+        self.stopped = 0
+        self.stuck = 0
+
+    async def send(self, update):
+        started = time.perf_counter()
+        await self.dp.process_update(update)
+        self.latencies.append(time.perf_counter() - started)
+
+    async def think(self):
+        if self.args.think:
+            await asyncio.sleep(self.rng.uniform(0, self.args.think))
+
+    async def register(self, chat_id, uids):
+        u = self.updates
+        await self.send(u.command(chat_id, uids[0], '/game'))
+        await asyncio.gather(*(self.think_and_send(u.command(chat_id, uid, '/join')) for uid in uids[1:]))
+        await self.send(u.command(chat_id, uids[0], '/start_mafia'))
+
+    async def think_and_send(self, update):
+        await self.think()
+        await self.send(update)
+
+    def target(self, game, uid):
+        seats = [p.seat for p in game.players.values() if p.alive and p.user_id != uid]
+        return self.rng.choice(seats) if seats else 0
+
+    async def play(self, chat_id):
+        u = self.updates
+        for _ in range(self.args.max_phases):
+            game = handlers.games.get(chat_id)
+            if game is None:
+                self.finished += 1
+                return
+            phase = game.phase
+            if phase == 'night':
+                moves = [u.button(uid, uid, f'n:{game.generation}:{self.target(game, uid)}') for uid in game.awaiting]
+            else:
+                moves = [u.button(chat_id, uid, f'v:{game.generation}:{self.target(game, uid)}') for uid in game.awaiting]
+            await asyncio.gather(*(self.think_and_send(update) for update in moves))
+            deadline = time.monotonic() + self.args.phase_timeout
+            while handlers.games.get(chat_id) is game and game.phase == phase:
+                if time.monotonic() > deadline:
+                    # Кто-то не смог сходить (например, снайпер второй раз): как если бы истёк таймер
+                    self.stuck += 1
+                    handlers.scheduler.fire_now(chat_id)
+                    deadline = time.monotonic() + self.args.phase_timeout
+                await asyncio.sleep(0.02)
+        self.stopped += 1
+        await self.send(u.command(chat_id, 0, '/stop'))
+
+
+async def main_async(args):
+    if not args.telegram_limits:
+        for name in ('GROUP_RATE', 'GROUP_BURST', 'PRIVATE_RATE', 'PRIVATE_BURST', 'GLOBAL_RATE'):
+            setattr(config, name, 1e6)
+    config.METRICS_PORT = 0
+    if not args.event_log:
+        config.EVENT_LOG_PATH = ''
+    config.ADMIN_IDS = [0]  # от имени пользователя 0 тест останавливает затянувшиеся игры
+    handlers.sender.workers = args.send_workers
+
+    server = FakeTelegram(args.latency, args.jitter, args.rate_429, seed=args.seed)
+    url = await server.start()
+    bot = Bot('1:load-test', server=TelegramAPIServer.from_base(url), connections_limit=args.send_workers)
+    dp = create_app(bot=bot, store=GameStore())
+    Bot.set_current(bot)
+    Dispatcher.set_current(dp)
+    await handlers.start_services()
+    driver = Driver(dp, args)
+    chats = [-1000000 - i for i in range(args.chats)]
+    players = {chat_id: [(i + 1) * 1000 + n for n in range(1, args.players + 1)] for i, chat_id in enumerate(chats)}
+
+    gc.collect()
+    base = rss()
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(driver.register(chat_id, players[chat_id]) for chat_id in chats))
+        gc.collect()
+        per_game = (rss() - base) / max(1, len(handlers.games))
+        registered = time.perf_counter() - started
+        print(f"игр начато: {len(handlers.games)} за {registered:.2f} с, память на игру: {per_game / 1024:.1f} КиБ")
+        await asyncio.gather(*(driver.play(chat_id) for chat_id in chats))
+        # Дождаться отправки хвоста сообщений
+        while handlers.sender.depth():
+            await asyncio.sleep(0.05)
+    finally:
+        elapsed = time.perf_counter() - started
+        await handlers.stop_services(dp)
+        await (await bot.get_session()).close()
+        await server.close()
+
+    latencies = sorted(driver.latencies)
+    calls = server.total()
+    sent = server.calls.get('sendMessage', 0)
+    print(f"апдейтов: {len(latencies)} за {elapsed:.2f} с ({len(latencies) / elapsed:.0f}/с), "
+          f"игр доиграно: {driver.finished}, остановлено по --max-phases: {driver.stopped}, "
+          f"фаз по таймеру: {driver.stuck}")
+    print(f"задержка обработки p50: {percentile(latencies, 0.5) * 1000:.2f} мс, "
+          f"p99: {percentile(latencies, 0.99) * 1000:.2f} мс, max: {percentile(latencies, 1) * 1000:.2f} мс")
+    print(f"Bot API: {calls} вызовов ({calls / elapsed:.0f}/с), sendMessage: {sent} ({sent / elapsed:.0f}/с), "
+          f"429: {server.rejected}, повторов: {handlers.sender.retried}, неудач: {handlers.sender.failed}")
+    print(f"по методам: {server.calls}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chats', type=int, default=1000)
+    parser.add_argument('--players', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.02, help="задержка ответа Bot API, с")
+    parser.add_argument('--jitter', type=float, default=0.01)
+    parser.add_argument('--rate-429', type=float, default=0.0, help="доля ответов 429 на отправку и правку")
+    parser.add_argument('--think', type=float, default=0.5, help="игрок думает до стольких секунд перед ходом")
+    parser.add_argument('--phase-timeout', type=float, default=5.0,
+                        help="через сколько секунд без смены фазы завершить её, как по таймеру")
+    parser.add_argument('--max-phases', type=int, default=40)
+    parser.add_argument('--send-workers', type=int, default=64)
+    parser.add_argument('--telegram-limits', action='store_true', help="не снимать лимиты отправки Telegram")
+    parser.add_argument('--event-log', action='store_true', help="писать журнал событий (EVENT_LOG_PATH)")
+    parser.add_argument('--seed', type=int, default=1)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Стресс-проверка очередей команд по чатам: тысячи одновременных апдейтов без Telegram.
+
+Во всех чатах сразу идут /game, /join (с повторами), /leave вперемешку со /start_mafia
+и /stop, ночные кнопки и голоса (с повторами и не в свою фазу). Все апдейты одной волны
+обрабатываются одновременно через dp.process_update. После каждой волны проверяется:
+
+- ни один обработчик не упал;
+- состав каждой игры ровно тот, что должен получиться при любом порядке команд;
+- индекс игроков указывает на их игры, а остановленные игры из него убраны;
+- живая игра совпадает с игрой, восстановленной по её журналу событий, то есть
+  ни одно изменение не потеряно и не применено наполовину.
+
+    python bench/stress_actors.py --chats 500 --players 12
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('NIGHT_TIMEOUT', '600')  # фазы должны заканчиваться ходами, а не таймером
+os.environ.setdefault('DAY_TIMEOUT', '600')
+
+from aiogram import Bot, Dispatcher, types  # noqa: E402
+
+from mafia_bot import config, handlers  # noqa: E402
+from mafia_bot.app import create_app  # noqa: E402
+from mafia_bot.instruments import HANDLER_ERRORS  # noqa: E402
+from mafia_bot.storage import MemoryGameStore  # noqa: E402
+from mafia_engine import NIGHT_ROLES, player_index  # noqa: E402
+from mafia_engine.replay import Replayer, ReplayError  # noqa: E402
+from sharding import _dry_run_bot  # noqa: E402
+
+# Поля снимка, которые ведёт бот, а не движок: по журналу они не восстанавливаются
+BOT_FIELDS = ('awaiting', 'deadline')
+
+
+class EventCapture(list):
+    """Журнал событий в памяти с интерфейсом AsyncEventLog."""
+
+    def __call__(self, event):
+        self.append(event)
+
+    def start(self):
+        pass
+
+    async def aclose(self):
+        pass
+
+
+class Updates:
+    def __init__(self):
+        self.next_id = 0
+
+    def _id(self):
+        self.next_id += 1
+        return self.next_id
+
+    def _user(self, uid):
+        return {'id': uid, 'is_bot': False, 'first_name': f'u{uid}'}
+
+    def command(self, chat_id, uid, text):
+        update_id = self._id()
+        return types.Update(update_id=update_id, message={
+            'message_id': update_id, 'date': 0, 'text': text,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(text)}],
+            'chat': {'id': chat_id, 'type': 'group'}, 'from': self._user(uid)})
+
+    def button(self, chat_id, uid, data):
+        update_id = self._id()
+        return types.Update(update_id=update_id, callback_query={
+            'id': str(update_id), 'chat_instance': '1', 'data': data, 'from': self._user(uid),
+            'message': {'message_id': 1, 'date': 0, 'chat': {'id': chat_id, 'type': 'private' if chat_id > 0 else 'group'}}})
+
+
+class Stress:
+    def __init__(self, dp, events, chats, players, seed):
+        self.dp = dp
+        self.rng = random.Random(seed)
+        self.updates = Updates()
+        self.chats = [-1000000 - i for i in range(chats)]
+        self.members = {chat_id: [(i + 1) * 1000 + n for n in range(1, players + 1)]
+                        for i, chat_id in enumerate(self.chats)}
+        self.expected = {chat_id: set() for chat_id in self.chats}  # кто должен быть в игре
+        self.stopped = set()
+        self.events = events
+        self.sent = 0
+        self.failures = []
+
+    async def wave(self, name, updates):
+        self.rng.shuffle(updates)
+        started = time.perf_counter()
+        await asyncio.gather(*(self.dp.process_update(u) for u in updates))
+        # Смены фаз запускаются таймерами и идут своими задачами: ждём, пока очереди чатов опустеют
+        await asyncio.sleep(0.05)
+        while handlers.actors.busy():
+            await asyncio.sleep(0.01)
+        self.sent += len(updates)
+        print(f"{name:<12} {len(updates):>7} апдейтов за {time.perf_counter() - started:6.2f} с")
+        self.check(name)
+
+    def fail(self, wave, chat_id, text):
+        self.failures.append(f"{wave}: чат {chat_id}: {text}")
+
+    def check(self, wave):
+        errors = sum(HANDLER_ERRORS.values.values())
+        if errors:
+            self.fail(wave, '-', f"исключений в обработчиках: {errors}")
+        # Копии игр из журнала пишут в тот же глобальный индекс игроков: сверяем индекс до них
+        saved_index = dict(player_index)
+        replayer = Replayer(verify=True)
+        for event in self.events:
+            try:
+                replayer.feed(event)
+            except ReplayError as e:
+                self.fail(wave, '-', f"журнал не воспроизводится: {e}")
+        replayed = replayer.games
+        by_chat = {game.chat_id: game for game in replayed.values()}
+        for chat_id in self.chats:
+            game = handlers.games.get(chat_id)
+            if chat_id in self.stopped:
+                if game is not None:
+                    self.fail(wave, chat_id, "остановленная игра жива")
+                stale = [uid for uid in self.members[chat_id] if (saved_index.get(uid) or (None,))[0] == chat_id]
+                if stale:
+                    self.fail(wave, chat_id, f"в индексе остались игроки {stale}")
+                continue
+            if game is None:
+                continue  # игра честно закончилась победой
+            expected = self.expected[chat_id]
+            if set(game.players) != expected:
+                self.fail(wave, chat_id, f"состав {sorted(game.players)} вместо {sorted(expected)}")
+            for uid in game.players:
+                entry = saved_index.get(uid)
+                if not entry or entry[0] != chat_id:
+                    self.fail(wave, chat_id, f"игрок {uid} в индексе указывает на {entry}")
+            replica = by_chat.get(chat_id)
+            if replica is None:
+                self.fail(wave, chat_id, "игры нет в журнале")
+                continue
+            live, copy = game.to_dict(), replica.to_dict()
+            for field in BOT_FIELDS:
+                live.pop(field)
+                copy.pop(field)
+            if live != copy:
+                diff = [key for key in live if live[key] != copy[key]]
+                self.fail(wave, chat_id, f"игра разошлась с журналом: {diff}")
+        player_index.clear()
+        player_index.update(saved_index)
+
+    async def run(self):
+        u = self.updates
+        for chat_id in self.chats:
+            self.expected[chat_id].add(self.members[chat_id][0])
+        await self.wave('/game', [u.command(chat_id, self.members[chat_id][0], '/game') for chat_id in self.chats])
+
+        joins = []
+        for chat_id in self.chats:
+            for uid in self.members[chat_id][1:]:
+                joins += [u.command(chat_id, uid, '/join'), u.command(chat_id, uid, '/join')]
+                self.expected[chat_id].add(uid)
+            joins.append(u.command(chat_id, self.members[chat_id][0], '/players'))
+        await self.wave('/join', joins)
+
+        # Уход игроков гоняется с началом игры: кто-то уходит до раздачи, кто-то посреди ночи
+        mixed = []
+        for chat_id in self.chats:
+            creator, *others = self.members[chat_id]
+            leaving = set(self.rng.sample(others, 2))
+            self.expected[chat_id] -= leaving
+            mixed += [u.command(chat_id, uid, '/leave') for uid in leaving]
+            mixed.append(u.command(chat_id, creator, '/start_mafia'))
+            if self.rng.random() < 0.2:
+                self.stopped.add(chat_id)
+                mixed.append(u.command(chat_id, creator, '/stop'))
+        await self.wave('/leave+start', mixed)
+
+        for round_ in range(1, 4):
+            presses = []
+            for chat_id in self.chats:
+                game = handlers.games.get(chat_id)
+                if game is None or game.phase != 'night':
+                    continue
+                seats = len(game.seats)
+                for uid, p in game.players.items():
+                    if p.alive and p.role in NIGHT_ROLES:
+                        presses += [u.button(uid, uid, f'n:{game.generation}:{self.rng.randrange(seats)}')
+                                    for _ in range(3)]
+                    # Голос ночью должен быть отвергнут, а не учтён
+                    presses.append(u.button(chat_id, uid, f'v:{game.generation}:0'))
+            await self.wave(f'ночь {round_}', presses)
+            for chat_id in self.chats:
+                game = handlers.games.get(chat_id)
+                if game is not None and game.phase == 'night' and game.awaiting:
+                    # Остались те, чьи случайные цели были недопустимы (сам себе, мёртвые): их ночь — по таймеру
+                    handlers.scheduler.fire_now(chat_id)
+            await self.wave('таймеры', [])
+
+            votes = []
+            for chat_id in self.chats:
+                game = handlers.games.get(chat_id)
+                if game is None or game.phase != 'day':
+                    continue
+                seats = len(game.seats)
+                for uid, p in game.players.items():
+                    if p.alive:
+                        votes += [u.button(chat_id, uid, f'v:{game.generation}:{self.rng.randrange(seats)}')
+                                  for _ in range(2)]
+            await self.wave(f'день {round_}', votes)
+            for chat_id in self.chats:
+                game = handlers.games.get(chat_id)
+                if game is not None and game.phase == 'day':
+                    handlers.scheduler.fire_now(chat_id)
+            await self.wave('таймеры', [])
+
+
+async def main_async(args):
+    for name in ('GROUP_RATE', 'GROUP_BURST', 'PRIVATE_RATE', 'PRIVATE_BURST', 'GLOBAL_RATE'):
+        setattr(config, name, 1e6)
+    config.METRICS_PORT = 0
+    events = EventCapture()
+    dp = create_app(bot=_dry_run_bot('1:stress'), store=MemoryGameStore(), events=events)
+    stress = Stress(dp, events, args.chats, args.players, args.seed)
+    Bot.set_current(dp.bot)
+    Dispatcher.set_current(dp)
+    await handlers.start_services()
+    started = time.perf_counter()
+    try:
+        await stress.run()
+    finally:
+        await handlers.stop_services(dp)
+    elapsed = time.perf_counter() - started
+
+    print(f"\nапдейтов: {stress.sent} за {elapsed:.2f} с ({stress.sent / elapsed:.0f}/с), "
+          f"команд через очереди чатов: {handlers.actors.processed}, событий: {len(stress.events)}")
+    if stress.failures:
+        print(f"❌ нарушений: {len(stress.failures)}")
+        for line in stress.failures[:20]:
+            print("  " + line)
+        sys.exit(1)
+    print("✅ потерянных и разорванных обновлений нет")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chats', type=int, default=300)
+    parser.add_argument('--players', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=1)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
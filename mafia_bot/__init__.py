@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""Telegram-бот Мафии поверх mafia_engine.
+
+    python -m mafia_bot          # или python mafia.py
+
+Импорт пакета ничего не создаёт и не тянет aiogram: Bot и Dispatcher собирает
+create_app() при запуске, а модули подгружаются по мере обращения к ним.
+"""
+
+
+def __getattr__(name):
+    if name in ('create_app', 'main'):
+        from . import app
+        return getattr(app, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
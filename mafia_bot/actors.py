@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Очереди команд по чатам: всё, что меняет игру, выполняется в её чате строго по одному."""
+
+import asyncio
+import contextvars
+import functools
+import inspect
+from collections import deque
+
+# У каждого чата своя очередь и свой исполнитель (задача), который живёт, пока очередь
+# не опустеет. Команды одного чата не перемешиваются даже через await внутри обработчика,
+# а разные чаты друг друга не ждут — общих блокировок нет.
+
+
+class ChatActors:
+    def __init__(self):
+        self.pending = {}  # chat_id -> deque((корутина-функция, args, kwargs, контекст, future))
+        self.tasks = {}    # chat_id -> задача, разбирающая очередь чата
+        self.processed = 0
+        # guard(chat_id) — асинхронный контекстный менеджер вокруг каждой команды
+        # (например, замок чата в хранилище, общем для нескольких реплик)
+        self.guard = None
+
+    async def run(self, chat_id, fn, *args, **kwargs):
+        """Выполняет fn(*args, **kwargs) в очереди чата и возвращает результат (или пробрасывает ошибку)."""
+        future = asyncio.get_event_loop().create_future()
+        queue = self.pending.get(chat_id)
+        if queue is None:
+            queue = self.pending[chat_id] = deque()
+            self.tasks[chat_id] = asyncio.get_event_loop().create_task(self._drain(chat_id, queue))
+        # Контекст вызывающего (текущие Bot, апдейт, обработчик) нужен команде, а не исполнителю
+        queue.append((fn, args, kwargs, contextvars.copy_context(), future))
+        return await future
+
+    async def _drain(self, chat_id, queue):
+        loop = asyncio.get_event_loop()
+        try:
+            while queue:
+                fn, args, kwargs, context, future = queue.popleft()
+                if future.cancelled():
+                    continue
+                try:
+                    result = await context.run(loop.create_task, self._call(chat_id, fn, args, kwargs))
+                except asyncio.CancelledError:
+                    future.cancel()
+                    raise
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    if not future.done():
+                        future.set_result(result)
+                self.processed += 1
+        finally:
+            # Между проверкой пустой очереди и удалением нет await, так что команда не потеряется
+            del self.pending[chat_id]
+            del self.tasks[chat_id]
+            for *_, future in queue:
+                future.cancel()
+
+    async def _call(self, chat_id, fn, args, kwargs):
+        if self.guard is None:
+            return await fn(*args, **kwargs)
+        async with self.guard(chat_id):
+            return await fn(*args, **kwargs)
+
+    def busy(self):
+        return len(self.pending)
+
+    async def close(self):
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def serialized(actors, chat_of):
+    """Обработчик aiogram выполняется в очереди чата chat_of(объект апдейта) (None — сразу).
+
+    chat_of может быть и корутиной, если чат приходится искать во внешнем хранилище.
+    """
+    def decorator(fn):
+        # wraps: aiogram смотрит сигнатуру через __wrapped__ и передаёт только нужные аргументы
+        @functools.wraps(fn)
+        async def wrapper(obj, *args, **kwargs):
+            chat_id = chat_of(obj)
+            if inspect.isawaitable(chat_id):
+                chat_id = await chat_id
+            if chat_id is None:
+                return await fn(obj, *args, **kwargs)
+            return await actors.run(chat_id, fn, obj, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""Сборка и запуск бота: Bot и Dispatcher создаются здесь, а не при импорте."""
+
+import sys
+
+from aiogram import Bot, Dispatcher
+from aiogram.bot.api import TelegramAPIServer
+from aiogram.utils import executor
+
+from . import config, handlers
+from .logs import log, setup_logging
+from .storage import make_event_log, make_fsm_storage, make_store
+
+
+def create_app(token=None, bot=None, store=None, events=None):
+    """Создаёт Dispatcher с обработчиками игры.
+
+    bot, store и events (журнал событий) можно передать готовыми (например, бот без сети
+    для проверок); иначе бот создаётся по токену (BOT_TOKEN), а остальное — по настройкам.
+    """
+    if bot is None:
+        token = token or config.BOT_TOKEN
+        if not token:
+            raise RuntimeError("переменная окружения BOT_TOKEN не задана")
+        if config.TELEGRAM_API_URL:
+            bot = Bot(token=token, server=TelegramAPIServer.from_base(config.TELEGRAM_API_URL))
+        else:
+            bot = Bot(token=token)
+    dp = Dispatcher(bot, storage=make_fsm_storage())
+    store = store if store is not None else make_store()
+    handlers.register(dp, store, events if events is not None else make_event_log(store))
+    return dp
+
+
+def main():
+    setup_logging()
+    try:
+        dp = create_app()
+    except Exception as e:
+        print(f"❌ Ошибка: {e}", file=sys.stderr)
+        sys.exit(1)
+    log.info("Бот запускается (%s)", config.MODE)
+    try:
+        if config.MODE == 'webhook':
+            from .webhook import run_webhook
+            run_webhook(dp)
+        else:
+            # Игры сохраняются, поэтому накопившиеся за перезапуск апдейты не выбрасываем
+            executor.start_polling(dp, on_startup=handlers.on_startup, on_shutdown=handlers.on_shutdown,
+                                   skip_updates=False)
+    except Exception:
+        log.exception("Ошибка в режиме %s", config.MODE)
+        sys.exit(1)
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""Настройки бота из переменных окружения.
+
+Модуль только читает окружение: отсутствие BOT_TOKEN проверяет create_app()
+при запуске, поэтому пакет можно импортировать без токена (тесты, бенчмарки).
+"""
+
+import os
+
+BOT_TOKEN = os.getenv("BOT_TOKEN")
+# Свой сервер Bot API вместо api.telegram.org (локальный telegram-bot-api или bench/fake_telegram.py)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+
+ADMIN_IDS = [123456789]  # Замените на свои ID (можно узнать у @userinfobot)
+
+NIGHT_TIMEOUT = int(os.getenv("NIGHT_TIMEOUT", "60"))
+DAY_TIMEOUT = int(os.getenv("DAY_TIMEOUT", "60"))
+EDIT_INTERVAL = 3.0  # не чаще одной правки одного сообщения (подсчёт голосов, кнопки) за столько секунд
+RELAY_INTERVAL = 1.0  # сообщения !м одного игрока за столько секунд склеиваются в одно
+
+# Режим получения апдейтов: polling или webhook
+MODE = os.getenv("MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # публичный https-адрес, например https://example.com/webhook
+# Обязателен при WEBHOOK_URL и при WEBHOOK_HOST не на loopback: Telegram присылает его в каждом запросе
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "127.0.0.1")  # за обратным прокси; 0.0.0.0 — принимать отовсюду
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_PUT_TIMEOUT = 2.0
+UPDATE_QUEUE_SIZE = 1000
+UPDATE_WORKERS = 16
+
+# Redis для игр и FSM (общий для нескольких реплик), например redis://localhost:6379/0.
+# Если не задан, игры сохраняются в SQLite, а FSM живёт в памяти.
+REDIS_URL = os.getenv("REDIS_URL")
+
+# Файл SQLite для сохранения игр между перезапусками (пустая строка — не сохранять)
+STORE_PATH = os.getenv("STORE_PATH", "mafia.sqlite3")
+STORE_FLUSH_INTERVAL = 1.0
+# Срок замка чата в Redis: столько команда одной реплики может держать игру, пока другие ждут
+STORE_LEASE = 10.0
+# Журнал событий всех игр (JSONL, .gz — сжатый) для разбора спорных партий: python -m mafia_engine.replay.
+# С REDIS_URL реплики пишут события не в этот файл, а в общий поток Redis mafia:events
+# (иначе события одной игры разошлись бы по файлам разных реплик); в файл его выгружает
+# python -m mafia_bot.export_events. Пустая строка — журнал не вести.
+EVENT_LOG_PATH = os.getenv("EVENT_LOG_PATH", "mafia_events.jsonl")
+
+# Метрики Prometheus на http://METRICS_HOST:METRICS_PORT/metrics (0 — не поднимать)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+# Доля апдейтов, попадающих в лог (пишем не каждое сообщение)
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+
+# Лимиты Telegram на отправку: ~30 сообщений/с всего, ~20/мин в группу, ~1/с в личку
+SEND_WORKERS = int(os.getenv("SEND_WORKERS", "8"))
+SEND_MAX_RETRIES = 3
+GLOBAL_RATE = 30
+GROUP_RATE, GROUP_BURST = 20 / 60, 5
+PRIVATE_RATE, PRIVATE_BURST = 1, 3
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""Выгрузка журнала событий из Redis (REDIS_URL) в файл для replay и analytics.
+
+    python -m mafia_bot.export_events mafia_events.jsonl --trim
+"""
+
+import argparse
+import asyncio
+
+from . import config
+from .storage import aioredis, export_events
+
+
+async def main_async(args):
+    client = aioredis.from_url(config.REDIS_URL)
+    try:
+        batches = await export_events(client, args.path, args.prefix, args.trim)
+    finally:
+        await client.aclose()
+    print(f"выгружено пачек событий: {batches}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Выгрузка журнала событий из Redis в JSONL")
+    parser.add_argument('path', nargs='?', default=config.EVENT_LOG_PATH or 'mafia_events.jsonl',
+                        help="куда дописать события (.jsonl, .jsonl.gz)")
+    parser.add_argument('--prefix', default='mafia')
+    parser.add_argument('--trim', action='store_true', help="удалить выгруженное из Redis")
+    args = parser.parse_args(argv)
+    if not config.REDIS_URL:
+        parser.error("задайте REDIS_URL")
+    if aioredis is None:
+        parser.error("нужен пакет redis: pip install redis")
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,624 @@
+# -*- coding: utf-8 -*-
+"""Обработчики команд и кнопок и игровой цикл поверх mafia_engine.
+
+Состояние процесса (игры, очередь отправки, таймеры) живёт в этом модуле;
+Bot и хранилище подключает register(), который вызывает create_app().
+"""
+
+import asyncio
+import contextlib
+import gc
+import time
+
+from aiogram import types
+from aiogram.dispatcher import FSMContext
+
+from mafia_engine import MAFIA_ROLES, NIGHT_ROLES, MafiaGame, Role, player_index
+
+from . import config
+from .actors import ChatActors, serialized
+from .instruments import (API_CALLS_SAVED, HANDLER_ERRORS, PHASE_SECONDS, REGISTRY, TRANSITION_SECONDS,
+                          MetricsMiddleware)
+from .keyboards import PhaseKeyboards
+from .logs import log, log_sampled
+from .metrics import serve
+from .relay import MafiaRelay
+from .scheduler import PhaseScheduler
+from .sending import MessageEditor, SendQueue
+from .storage import GameStore
+
+games = {}
+actors = ChatActors()  # всё, что меняет игру чата, идёт через его очередь команд
+sender = SendQueue()
+scheduler = PhaseScheduler()
+editor = MessageEditor(sender)
+relay = MafiaRelay(sender)
+store = GameStore()  # настоящее хранилище подставляет register()
+event_log = None  # журнал событий игр (AsyncEventLog), если включён
+keyboards = {}  # chat_id -> PhaseKeyboards
+vote_messages = {}  # chat_id -> message_id сообщения с голосованием
+phase_started = {}  # chat_id -> time.monotonic() начала текущей фазы
+phase_edits = {}  # chat_id -> кому в этой фазе уже правили сообщение с кнопками
+metrics_runner = None
+# Ответ на /game и /join игроку, у которого уже идёт игра в другом чате (его же шлёт sharding.py)
+PLAYS_ELSEWHERE = "Вы уже играете в другом чате. Сначала закончите ту игру."
+
+def end_game(chat_id, winner=None):
+    scheduler.cancel(chat_id)
+    store.delete(chat_id)
+    keyboards.pop(chat_id, None)
+    phase_started.pop(chat_id, None)
+    phase_edits.pop(chat_id, None)
+    relay.forget(chat_id)
+    message_id = vote_messages.pop(chat_id, None)
+    if message_id:
+        editor.cancel(chat_id, message_id)
+    game = games.pop(chat_id, None)
+    if game:
+        game.finish(winner)
+
+def _games_by_phase():
+    counts = {}
+    for game in games.values():
+        counts[(game.phase,)] = counts.get((game.phase,), 0) + 1
+    return counts
+
+REGISTRY.gauge('mafia_games', "Активные игры по фазам", _games_by_phase, ('phase',))
+REGISTRY.gauge('mafia_chat_queues', "Чатов с командами в очереди", actors.busy)
+REGISTRY.gauge('mafia_send_queue_depth', "Сообщений в очереди отправки", sender.depth)
+REGISTRY.gauge('mafia_send_total', "Итоги отправки сообщений",
+               lambda: {('sent',): sender.sent, ('failed',): sender.failed, ('retried',): sender.retried},
+               ('result',), kind='counter')
+
+async def count_errors(update, error):
+    HANDLER_ERRORS.inc(type(error).__name__)
+    log.exception("Ошибка обработки апдейта %s", update.update_id)
+    return True
+
+def begin_phase(chat_id):
+    phase_started[chat_id] = time.monotonic()
+    phase_edits.pop(chat_id, None)
+
+def timed_transition(phase):
+    """Для end_night/end_day: пишет длительность закончившейся фазы и время перехода к следующей."""
+    def decorator(fn):
+        async def wrapper(game):
+            started = time.monotonic()
+            begun = phase_started.pop(game.chat_id, None)
+            if begun is not None:
+                PHASE_SECONDS.observe(started - begun, phase)
+            try:
+                return await fn(game)
+            finally:
+                TRANSITION_SECONDS.observe(time.monotonic() - started, phase)
+        wrapper.__name__ = fn.__name__
+        return wrapper
+    return decorator
+
+def adopt_game(data, now):
+    """Поднимает игру из снимка и заново ставит таймер её фазы."""
+    game = MafiaGame.from_dict(data, event_log)
+    games[game.chat_id] = game
+    delay = max(0, game.deadline - now) if game.deadline else 0
+    if game.phase == 'night':
+        scheduler.schedule(game.chat_id, delay, lambda g=game: actors.run(g.chat_id, end_night, g))
+    elif game.phase == 'day':
+        scheduler.schedule(game.chat_id, delay, lambda g=game: actors.run(g.chat_id, end_day, g))
+    return game
+
+async def restore_games(owns=None):
+    """Поднимает сохранённые игры и заново ставит таймеры их фаз.
+
+    owns(chat_id) -> bool ограничивает восстановление играми своего шарда.
+    """
+    snapshots = await store.load_all()
+    now = time.time()
+    # Массовое создание объектов без циклов: сборщик мусора тут только тратит время
+    gc.disable()
+    try:
+        for data in snapshots:
+            if owns is None or owns(data['chat_id']):
+                adopt_game(data, now)
+    finally:
+        gc.enable()
+    return len(games)
+
+def sync_game(chat_id, data):
+    """Заменяет локальную копию игры снимком из общего хранилища (None — игры там больше нет).
+
+    Нужна, когда игру изменила другая реплика: старые таймеры и кнопки этой копии
+    больше ничего не трогают, потому что проверяют, та ли это ещё игра.
+    """
+    old = games.pop(chat_id, None)
+    if old is not None:
+        old.release()
+    scheduler.cancel(chat_id)
+    keyboards.pop(chat_id, None)
+    phase_edits.pop(chat_id, None)
+    if data is None:
+        phase_started.pop(chat_id, None)
+        relay.forget(chat_id)
+        message_id = vote_messages.pop(chat_id, None)
+        if message_id:
+            editor.cancel(chat_id, message_id)
+        return
+    adopt_game(data, time.time())
+
+@contextlib.asynccontextmanager
+async def claimed(chat_id):
+    """Команда чата под замком общего хранилища: до неё игра сверяется с хранилищем, после — записывается.
+
+    Другие реплики видят игру только через хранилище, поэтому сохраняется и каждый ход,
+    а не только смена фазы (неизменившийся снимок хранилище не перезаписывает).
+    """
+    fresh, data = await store.acquire(chat_id)
+    if fresh:
+        sync_game(chat_id, data)
+    try:
+        yield
+    finally:
+        game = games.get(chat_id)
+        if game is not None:
+            store.save(game)
+        await store.release(chat_id)
+
+def _message_chat(message):
+    return message.chat.id
+
+def _callback_chat(callback):
+    return callback.message.chat.id if callback.message else None
+
+async def _player_chat(update):
+    # Ночные кнопки и !м приходят в личку: чат игры — по индексу игроков,
+    # а при нескольких репликах — по общему хранилищу (игра могла начаться на другой)
+    user_id = update.from_user.id
+    if store.shared:
+        chat_id = await store.player_chat(user_id)
+        if chat_id is not None:
+            return chat_id
+    entry = player_index.get(user_id)
+    return entry[0] if entry else None
+
+@serialized(actors, _player_chat)
+async def mafia_chat(message: types.Message):
+    # Сюда доходят только личные сообщения с !м (см. фильтр в register)
+    user_id = message.from_user.id
+    entry = player_index.get(user_id)
+    if not entry:
+        return
+    chat_id, role, alive = entry
+    game = games.get(chat_id)
+    if not game or not alive or role not in MAFIA_ROLES:
+        return
+    text = message.text[2:].strip()
+    if text:
+        relay.post(game, user_id, text)
+
+async def cmd_start(message: types.Message):
+    log_sampled("Команда /start от %s", message.from_user.id)
+    sender.send_message(message.chat.id,
+        "👋 Привет! Я бот для игры в Мафию (20 ролей).\n\n"
+        "Команды:\n"
+        "/game — создать новую игру в этом чате\n"
+        "/join — присоединиться к игре\n"
+        "/leave — покинуть игру\n"
+        "/start_mafia — начать игру (только создатель)\n"
+        "/stop — остановить игру (админ или создатель)\n"
+        "/players — список игроков\n\n"
+        "Во время игры мафия может общаться в личке с ботом, начиная сообщения с !м ."
+    )
+
+def _plays_elsewhere(user_id, chat_id):
+    # Одна незавершённая игра на игрока: иначе ночные кнопки и !м из лички не понять, к какой игре относятся
+    entry = player_index.get(user_id)
+    return entry is not None and entry[0] != chat_id
+
+@serialized(actors, _message_chat)
+async def cmd_new_game(message: types.Message):
+    chat_id = message.chat.id
+    if chat_id in games:
+        sender.send_message(message.chat.id, "В этом чате уже есть игра. Используйте /join чтобы присоединиться.")
+        return
+    if _plays_elsewhere(message.from_user.id, chat_id):
+        sender.send_message(message.chat.id, PLAYS_ELSEWHERE)
+        return
+    games[chat_id] = game = MafiaGame(chat_id, message.from_user.id, events=event_log)
+    game.add_player(message.from_user.id, message.from_user.full_name)
+    store.save(game)
+    sender.send_message(message.chat.id,
+        "🕵️ Новая игра в Мафию создана!\n"
+        "Присоединяйтесь: /join\n"
+        "Начать игру может создатель командой /start_mafia"
+    )
+
+@serialized(actors, _message_chat)
+async def cmd_join(message: types.Message):
+    chat_id = message.chat.id
+    game = games.get(chat_id)
+    if not game:
+        sender.send_message(message.chat.id, "В этом чате нет игры. Создайте: /game")
+        return
+    if game.phase != 'registration':
+        sender.send_message(message.chat.id, "Игра уже началась, присоединиться нельзя.")
+        return
+    if _plays_elsewhere(message.from_user.id, chat_id):
+        sender.send_message(message.chat.id, PLAYS_ELSEWHERE)
+        return
+    if game.add_player(message.from_user.id, message.from_user.full_name):
+        store.save(game)
+        sender.send_message(message.chat.id, f"{message.from_user.full_name} присоединился к игре. ({len(game.players)}/20)")
+    else:
+        sender.send_message(message.chat.id, "Вы уже в игре или достигнут лимит.")
+
+@serialized(actors, _message_chat)
+async def cmd_leave(message: types.Message):
+    chat_id = message.chat.id
+    game = games.get(chat_id)
+    if not game:
+        return
+    if game.remove_player(message.from_user.id):
+        sender.send_message(message.chat.id, f"{message.from_user.full_name} покинул игру.")
+        if len(game.players) == 0:
+            end_game(chat_id)
+        else:
+            store.save(game)
+            if game.phase != 'registration' and not game.awaiting:
+                # Ждали только ушедшего — фаза заканчивается сейчас
+                scheduler.fire_now(chat_id)
+
+@serialized(actors, _message_chat)
+async def cmd_players(message: types.Message):
+    chat_id = message.chat.id
+    game = games.get(chat_id)
+    if not game:
+        sender.send_message(message.chat.id, "Нет активной игры.")
+        return
+    if game.phase == 'registration':
+        players_list = "\n".join([p.name for p in game.players.values()])
+        sender.send_message(message.chat.id, f"Игроки ({len(game.players)}/20):\n{players_list}")
+    else:
+        alive = [p.name for p in game.players.values() if p.alive]
+        dead = [p.name for p in game.players.values() if not p.alive]
+        text = f"Живы ({len(alive)}): {', '.join(alive)}\n"
+        if dead:
+            text += f"Мертвы: {', '.join(dead)}"
+        sender.send_message(message.chat.id, text)
+
+@serialized(actors, _message_chat)
+async def cmd_stop(message: types.Message):
+    chat_id = message.chat.id
+    game = games.get(chat_id)
+    if not game:
+        sender.send_message(message.chat.id, "Нет активной игры.")
+        return
+    if message.from_user.id != game.creator_id and message.from_user.id not in config.ADMIN_IDS:
+        sender.send_message(message.chat.id, "❌ Только создатель игры или администратор может остановить игру.")
+        return
+    end_game(chat_id)
+    sender.send_message(message.chat.id, "Игра остановлена.")
+
+@serialized(actors, _message_chat)
+async def cmd_start_mafia(message: types.Message, state: FSMContext):
+    chat_id = message.chat.id
+    game = games.get(chat_id)
+    if not game:
+        sender.send_message(message.chat.id, "Нет игры.")
+        return
+    if message.from_user.id != game.creator_id:
+        sender.send_message(message.chat.id, "Только создатель может начать игру.")
+        return
+    if game.phase != 'registration':
+        sender.send_message(message.chat.id, "Игра уже начата.")
+        return
+    if not game.start_game():
+        sender.send_message(message.chat.id, "Недостаточно игроков (нужно минимум 4).")
+        return
+
+    for uid, p in game.players.items():
+        card = sender.send_message(uid, f"🃏 Твоя роль: *{p.role.label}*", parse_mode='Markdown')
+        card.add_done_callback(_report_undelivered(chat_id, p.name))
+    sender.send_message(message.chat.id, "🌙 Наступает ночь. Игроки с активными ролями, проверьте личные сообщения.")
+    start_night_cycle(game)
+
+def _report_undelivered(chat_id, name):
+    # Чем кончилась отправка, узнаём потом: очередь чата ради этого не держим
+    def callback(future):
+        if not future.cancelled() and future.exception() is not None:
+            sender.send_message(chat_id, f"Не удалось отправить личное сообщение игроку {name}.")
+    return callback
+
+def phase_keyboards(game):
+    kb = keyboards.get(game.chat_id)
+    if kb is None or kb.alive_mask != game.alive_mask:
+        kb = keyboards[game.chat_id] = PhaseKeyboards(game)
+    return kb
+
+def vote_text(game):
+    lines = [f"🗳️ День. Голосуйте за исключение игрока (таймер {config.DAY_TIMEOUT} секунд):"]
+    if game.vote_counts:
+        lines.append("")
+        for uid, count in sorted(game.vote_counts.items(), key=lambda item: -item[1]):
+            player = game.players.get(uid)
+            lines.append(f"{player.name if player else '?'} — {count}")
+        leader = game.players.get(game.vote_leader)
+        lines.append(f"Лидирует: {leader.name}" if leader else "Лидера нет: голоса поровну.")
+    return "\n".join(lines)
+
+def start_night_cycle(game: MafiaGame):
+    chat_id = game.chat_id
+    game.begin_night()
+    begin_phase(chat_id)
+    game.awaiting = set()
+    kb = phase_keyboards(game)
+    for role in NIGHT_ROLES:
+        players_with_role = game.get_players_by_role(role, alive_only=True)
+        if not players_with_role:
+            continue
+        for uid in players_with_role:
+            # Одноразовый ход (снайпер) уже сделан: ни кнопок, ни ожидания
+            if len(kb.night_buttons) < 2 or not game.can_act(uid):
+                continue
+            game.awaiting.add(uid)
+            sender.send_message(uid, f"🌙 Ночь. Ты — *{role.label}*. Выбери цель:", reply_markup=kb.night_markup(uid), parse_mode='Markdown')
+    # Сообщения выше только встали в очередь отправки, так что ночь отсчитывается почти с её начала
+    scheduler.schedule(chat_id, config.NIGHT_TIMEOUT, lambda: actors.run(chat_id, end_night, game))
+    game.deadline = time.time() + config.NIGHT_TIMEOUT
+    store.save(game)
+    if not game.awaiting:
+        scheduler.fire_now(chat_id)
+
+def inspection_text(game, actor_id, target_id):
+    role = game.players[actor_id].role
+    target = game.players[target_id]
+    if role == Role.COMMISSAR:
+        verdict = "мафия" if target.role in MAFIA_ROLES else "не мафия"
+    elif role == Role.DON:
+        verdict = "комиссар" if target.role == Role.COMMISSAR else "не комиссар"
+    else:
+        verdict = target.role.label
+    return f"🔎 Проверка: {target.name} — {verdict}."
+
+def send_inspections(game: MafiaGame):
+    for actor, target in game.inspections:
+        sender.send_message(actor, inspection_text(game, actor, target))
+
+
+@timed_transition('night')
+async def end_night(game: MafiaGame):
+    chat_id = game.chat_id
+    if games.get(chat_id) is not game:
+        return
+    killed_ids = game.resolve_night()
+    send_inspections(game)
+    dead_names = game.apply_deaths(killed_ids)
+    if dead_names:
+        sender.send_message(chat_id, f"☠️ Утром обнаружены тела:\n" + "\n".join(dead_names))
+    else:
+        sender.send_message(chat_id, "☀️ Утро наступило, все живы.")
+    winner = game.check_winner()
+    if winner:
+        sender.send_message(chat_id, f"🏆 Игра окончена! Победили: {winner}!")
+        end_game(chat_id, winner)
+        return
+    start_day_vote(game)
+
+def start_day_vote(game: MafiaGame):
+    chat_id = game.chat_id
+    game.begin_day()
+    begin_phase(chat_id)
+    alive = game.alive_players()
+    if not alive:
+        sender.send_message(chat_id, "❓ Нет живых игроков. Игра завершена.")
+        end_game(chat_id)
+        return
+    game.awaiting = set(alive)
+    markup = phase_keyboards(game).vote_markup
+    scheduler.schedule(chat_id, config.DAY_TIMEOUT, lambda: actors.run(chat_id, end_day, game))
+    game.deadline = time.time() + config.DAY_TIMEOUT
+    store.save(game)
+    # message_id нужен только для правок подсчёта: ждём его вне очереди чата
+    text, nights = vote_text(game), game.nights
+    sender.send_message(chat_id, text, reply_markup=markup).add_done_callback(
+        lambda future: _vote_message_sent(game, nights, text, future))
+
+def _vote_message_sent(game, nights, text, future):
+    if future.cancelled() or future.exception() is not None or not future.result():
+        return  # уже залогировано в очереди отправки; голосование закончится по таймеру
+    message_id = future.result().message_id
+    if games.get(game.chat_id) is game and game.phase == 'day' and game.nights == nights:
+        vote_messages[game.chat_id] = message_id
+    else:
+        # День закончился раньше, чем Telegram ответил: просто убираем кнопки
+        editor.finish(game.chat_id, message_id, text)
+
+
+@timed_transition('day')
+async def end_day(game: MafiaGame):
+    chat_id = game.chat_id
+    if games.get(chat_id) is not game:
+        return
+    executed = game.resolve_day()
+    message_id = vote_messages.pop(chat_id, None)
+    if message_id:
+        # Итоговый подсчёт без кнопок
+        editor.finish(chat_id, message_id, vote_text(game))
+    if not game.day_votes:
+        sender.send_message(chat_id, "Никто не голосовал. Никого не исключили.")
+    elif executed is not None:
+        game.apply_deaths([executed])
+        sender.send_message(chat_id, f"☠️ По результатам голосования исключён {game.players[executed].name} (роль: {game.players[executed].role.label}).")
+    else:
+        sender.send_message(chat_id, "Голоса разделились – никто не исключён.")
+    winner = game.check_winner()
+    if winner:
+        sender.send_message(chat_id, f"🏆 Игра окончена! Победили: {winner}!")
+        end_game(chat_id, winner)
+        return
+    start_night_cycle(game)
+
+def acknowledge(callback: types.CallbackQuery, game: MafiaGame, text, edit_text=None, duplicate=False):
+    """Общий ответ на нажатие кнопки в игре.
+
+    Ответ на callback нужен всегда (иначе у игрока крутятся часики), а сообщение
+    с кнопками правится не больше одного раза за фазу на игрока.
+    """
+    answer(callback, text)
+    if duplicate:
+        # Повторное нажатие ничего не изменило: ни хода, ни правки
+        API_CALLS_SAVED.inc('duplicate')
+        return
+    if edit_text is None:
+        return
+    edited = phase_edits.setdefault(game.chat_id, set())
+    if callback.from_user.id in edited:
+        API_CALLS_SAVED.inc('edited')
+        return
+    edited.add(callback.from_user.id)
+    editor.edit(callback.message.chat.id, callback.message.message_id, edit_text)
+
+def answer(callback, text):
+    """Отвечает на нажатие кнопки, не задерживая очередь чата ожиданием ответа Telegram."""
+    task = asyncio.get_event_loop().create_task(callback.answer(text))
+    task.add_done_callback(lambda t: t.cancelled() or not t.exception() or
+                           log.warning("Не удалось ответить на кнопку: %s", t.exception()))
+
+def mark_acted(game: MafiaGame, user_id):
+    """Отмечает, что игрок сделал ход; когда все походили, фаза завершается досрочно."""
+    game.awaiting.discard(user_id)
+    if not game.awaiting:
+        scheduler.fire_now(game.chat_id)
+
+def parse_target(game, data):
+    """Разбирает "n:<поколение>:<место>" / "v:...": user_id цели или None для устаревшей кнопки."""
+    try:
+        _, gen, seat = data.split(':')
+        return game.seat_target(int(gen), int(seat))
+    except ValueError:
+        return None
+
+@serialized(actors, _player_chat)
+async def night_callback(callback: types.CallbackQuery):
+    user_id = callback.from_user.id
+    # Кнопки приходят в личку игрока, поэтому игру ищем по индексу игроков
+    entry = player_index.get(user_id)
+    game = games.get(entry[0]) if entry else None
+    if not game:
+        answer(callback, "Игра не найдена.")
+        return
+    if game.phase != 'night':
+        answer(callback, "Ночь уже закончилась.")
+        return
+    player = game.players.get(user_id)
+    if player is None or not player.alive or player.role not in NIGHT_ROLES:
+        answer(callback, "Вы не можете выполнить это действие.")
+        return
+    target_id = parse_target(game, callback.data)
+    if target_id is None or target_id == user_id:
+        answer(callback, "Кнопка устарела.")
+        return
+    if game.night_actions.get(user_id) == target_id:
+        acknowledge(callback, game, "Цель уже выбрана.", duplicate=True)
+        return
+    if not game.set_night_action(user_id, target_id):
+        answer(callback, "Это действие уже использовано.")
+        return
+    mark_acted(game, user_id)
+    acknowledge(callback, game, "Действие принято.", "✅ Ты выбрал цель. Жди результатов.")
+
+@serialized(actors, _callback_chat)
+async def vote_callback(callback: types.CallbackQuery):
+    user_id = callback.from_user.id
+    chat_id = callback.message.chat.id
+    game = games.get(chat_id)
+    if not game or game.phase != 'day':
+        answer(callback, "Сейчас не время для голосования.")
+        return
+    if user_id not in game.players or not game.players[user_id].alive:
+        answer(callback, "Вы не можете голосовать.")
+        return
+    target_id = parse_target(game, callback.data)
+    if target_id is None:
+        answer(callback, "Кнопка устарела.")
+        return
+    if not game.cast_vote(user_id, target_id):
+        acknowledge(callback, game, "Голос уже учтён.", duplicate=True)
+        return
+    # Личной правки нет: сообщение голосования общее, в нём обновляется подсчёт
+    acknowledge(callback, game, f"Голос за {game.players[target_id].name} учтён.")
+    editor.edit(chat_id, callback.message.message_id, vote_text(game), reply_markup=phase_keyboards(game).vote_markup)
+    mark_acted(game, user_id)
+    if game.vote_decided():
+        # Строгое большинство уже набрано: ждать остальных незачем
+        scheduler.fire_now(chat_id)
+
+async def stale_callback(callback: types.CallbackQuery):
+    # Кнопки старого формата или от завершённых игр
+    await callback.answer("Кнопка устарела.")
+
+async def debug_handler(message: types.Message):
+    # Текст не пишем: в логе незачем хранить чужую переписку
+    log_sampled("Необработанное сообщение от %s (%d симв.)", message.from_user.id, len(message.text or ''))
+
+async def start_services(owns=None):
+    global metrics_runner
+    if config.METRICS_PORT:
+        metrics_runner = await serve(REGISTRY, config.METRICS_HOST, config.METRICS_PORT)
+    sender.start()
+    scheduler.start()
+    store.start()
+    if event_log:
+        event_log.start()
+    restored = await restore_games(owns)
+    if restored:
+        log.info("Восстановлено игр: %d", restored)
+
+async def stop_services(dp):
+    global metrics_runner
+    await actors.close()
+    editor.close()
+    relay.close()
+    await scheduler.close()
+    await store.close()
+    if event_log:
+        await event_log.aclose()
+    await sender.close()
+    await dp.storage.close()
+    await dp.storage.wait_closed()
+    if metrics_runner:
+        await metrics_runner.cleanup()
+        metrics_runner = None
+
+async def on_startup(dp):
+    await start_services()
+    try:
+        await dp.bot.delete_webhook()
+        log.info("Webhook удалён, запускаем polling")
+    except Exception:
+        log.exception("Ошибка при удалении webhook")
+
+async def on_shutdown(dp):
+    await stop_services(dp)
+
+def register(dp, game_store, game_events=None):
+    """Подключает к dp обработчики и метрики, а очередь отправки — к его боту."""
+    global store, event_log
+    store = game_store
+    event_log = game_events
+    actors.guard = claimed if store.shared else None
+    sender.bot = dp.bot
+    dp.middleware.setup(MetricsMiddleware())
+    dp.register_errors_handler(count_errors)
+    # Остальные личные сообщения (/start и прочие) идут дальше, мимо поиска игры
+    dp.register_message_handler(mafia_chat, lambda message: message.chat.type == 'private'
+                                and message.text is not None and message.text.startswith('!м'), state='*')
+    dp.register_message_handler(cmd_start, commands=['start', 'help'])
+    dp.register_message_handler(cmd_new_game, commands=['game'])
+    dp.register_message_handler(cmd_join, commands=['join'])
+    dp.register_message_handler(cmd_leave, commands=['leave'])
+    dp.register_message_handler(cmd_players, commands=['players'])
+    dp.register_message_handler(cmd_stop, commands=['stop'])
+    dp.register_message_handler(cmd_start_mafia, commands=['start_mafia'])
+    dp.register_callback_query_handler(night_callback, lambda c: c.data.startswith('n:'))
+    dp.register_callback_query_handler(vote_callback, lambda c: c.data.startswith('v:'))
+    dp.register_callback_query_handler(stale_callback)
+    dp.register_message_handler(debug_handler)
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""Метрики бота и middleware, которая меряет обработчики."""
+
+import time
+
+from aiogram.dispatcher.handler import current_handler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+
+from .metrics import Registry
+
+REGISTRY = Registry()
+UPDATES = REGISTRY.counter('mafia_updates_total', "Полученные апдейты по типу", ('type',))
+HANDLER_SECONDS = REGISTRY.histogram('mafia_handler_seconds', "Время работы обработчика", ('handler',))
+HANDLER_ERRORS = REGISTRY.counter('mafia_handler_errors_total', "Исключения в обработчиках", ('exception',))
+PHASE_SECONDS = REGISTRY.histogram('mafia_phase_seconds', "Длительность фазы от начала до подведения итогов",
+                                   ('phase',), buckets=(1, 5, 10, 20, 30, 45, 60, 90, 120, 300))
+TRANSITION_SECONDS = REGISTRY.histogram('mafia_phase_transition_seconds',
+                                        "Время подведения итогов фазы и запуска следующей", ('phase',))
+API_CALLS_SAVED = REGISTRY.counter('mafia_api_calls_saved_total',
+                                   "Вызовы Bot API, которых удалось избежать", ('reason',))
+SEND_SECONDS = REGISTRY.histogram('mafia_send_seconds', "Время от постановки в очередь до отправки")
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Считает апдейты и время каждого обработчика сообщений и кнопок."""
+
+    # dp.process_update (webhook, шарды) не вызывает pre_process_update, поэтому считаем по типам
+    async def on_pre_process_message(self, message, data):
+        UPDATES.inc('message')
+
+    async def on_pre_process_callback_query(self, callback, data):
+        UPDATES.inc('callback_query')
+
+    async def _started(self, data):
+        # К post_process current_handler уже сброшен, поэтому имя запоминаем здесь
+        handler = current_handler.get(None)
+        data['_metrics'] = (getattr(handler, '__name__', 'unknown'), time.perf_counter())
+
+    async def _finished(self, data):
+        started = data.pop('_metrics', None)
+        if started:
+            HANDLER_SECONDS.observe(time.perf_counter() - started[1], started[0])
+
+    async def on_process_message(self, message, data):
+        await self._started(data)
+
+    async def on_post_process_message(self, message, results, data):
+        await self._finished(data)
+
+    async def on_process_callback_query(self, callback, data):
+        await self._started(data)
+
+    async def on_post_process_callback_query(self, callback, results, data):
+        await self._finished(data)
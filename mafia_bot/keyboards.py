@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""Inline-клавиатуры фаз в готовом JSON.
+
+Кнопки целей сериализуются в JSON один раз на состав живых игроков; клавиатура
+каждого ночного игрока — это те же кнопки без него самого. callback_data короткая:
+"n:<поколение>:<место>" ночью и "v:<поколение>:<место>" днём.
+"""
+
+import json
+
+
+def _button(name, data):
+    return json.dumps({'text': name[:15], 'callback_data': data}, ensure_ascii=False)
+
+
+def _markup(buttons):
+    rows = ['[' + ','.join(buttons[i:i + 2]) + ']' for i in range(0, len(buttons), 2)]
+    return '{"inline_keyboard":[' + ','.join(rows) + ']}'
+
+
+class PhaseKeyboards:
+    __slots__ = ('alive_mask', 'night_buttons', 'vote_markup')
+
+    def __init__(self, game):
+        self.alive_mask = game.alive_mask
+        alive = [game.players[uid] for uid in game.alive_players()]
+        gen = game.generation
+        self.night_buttons = [(p.user_id, _button(p.name, f"n:{gen}:{p.seat}")) for p in alive]
+        self.vote_markup = _markup([_button(p.name, f"v:{gen}:{p.seat}") for p in alive])
+
+    def night_markup(self, actor_id):
+        return _markup([button for uid, button in self.night_buttons if uid != actor_id])
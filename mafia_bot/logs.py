@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""Логгер бота и неблокирующая запись логов."""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+
+from . import config
+
+log = logging.getLogger('mafia')
+
+
+def setup_logging():
+    """Лог пишется в stderr из отдельного потока: обработчики только кладут запись в очередь."""
+    if logging.getLogger().handlers:
+        return  # логирование уже настроил запускающий код (например, воркер шарда)
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, logging.StreamHandler(sys.stderr))
+    logging.basicConfig(level=logging.INFO, handlers=[logging.handlers.QueueHandler(log_queue)])
+    listener.start()
+    atexit.register(listener.stop)
+
+
+def log_sampled(msg, *args):
+    if random.random() < config.LOG_SAMPLE_RATE:
+        log.info(msg, *args)
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""Минимальные метрики в текстовом формате Prometheus, без внешних зависимостей.
+
+    REGISTRY = Registry()
+    requests = REGISTRY.counter('requests_total', "Всего запросов", ('kind',))
+    requests.inc('message')
+    latency = REGISTRY.histogram('latency_seconds', "Задержка", ('handler',))
+    latency.observe(0.012, 'cmd_start')
+"""
+
+from aiohttp import web
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join('%s="%s"' % (n, str(v).replace('\\', '\\\\').replace('"', '\\"')) for n, v in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, doc, labelnames=()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = labelnames
+        self.values = {}
+
+    def inc(self, *labelvalues, amount=1):
+        self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        for labelvalues, value in self.values.items():
+            yield self.name, _labels(self.labelnames, labelvalues), value
+
+
+class Gauge:
+    """Значение считается при каждом запросе /metrics: fn() -> {labelvalues: value} или число.
+
+    kind='counter' — для монотонных счётчиков, которые уже ведёт кто-то другой.
+    """
+
+    def __init__(self, name, doc, fn, labelnames=(), kind='gauge'):
+        self.name = name
+        self.doc = doc
+        self.fn = fn
+        self.labelnames = labelnames
+        self.kind = kind
+
+    def samples(self):
+        values = self.fn()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labelvalues, value in values.items():
+            yield self.name, _labels(self.labelnames, labelvalues), value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, doc, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.doc = doc
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.series = {}  # labelvalues -> [счётчики по корзинам..., сумма, количество]
+
+    def observe(self, value, *labelvalues):
+        series = self.series.get(labelvalues)
+        if series is None:
+            series = self.series[labelvalues] = [0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+                break
+        series[-2] += value
+        series[-1] += 1
+
+    def samples(self):
+        names = self.labelnames + ('le',)
+        for labelvalues, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield self.name + '_bucket', _labels(names, labelvalues + (bound,)), cumulative
+            yield self.name + '_bucket', _labels(names, labelvalues + ('+Inf',)), series[-1]
+            yield self.name + '_sum', _labels(self.labelnames, labelvalues), series[-2]
+            yield self.name + '_count', _labels(self.labelnames, labelvalues), series[-1]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, doc, labelnames=()):
+        return self._add(Counter(name, doc, labelnames))
+
+    def gauge(self, name, doc, fn, labelnames=(), kind='gauge'):
+        return self._add(Gauge(name, doc, fn, labelnames, kind))
+
+    def histogram(self, name, doc, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, doc, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.doc}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+async def serve(registry, host, port):
+    """Поднимает HTTP-сервер с /metrics; возвращает AppRunner (для cleanup())."""
+    async def handle(request):
+        return web.Response(text=registry.render(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Переписка мафии в личке: сообщения !м пересылаются остальным живым мафиози."""
+
+import asyncio
+
+from mafia_engine import MAFIA_ROLES
+
+from . import config
+from .instruments import API_CALLS_SAVED
+
+MESSAGE_LIMIT = 4096  # длина сообщения в Telegram
+
+# Состав команды считается один раз и пересчитывается, только когда меняется состав
+# живых (alive_mask). Первое сообщение игрока уходит сразу, а всё, что он напишет
+# в следующие interval секунд, склеивается в одно сообщение каждому получателю.
+# Сама рассылка идёт через SendQueue: её воркеры и лимиты общие для всего бота.
+
+
+class MafiaRelay:
+    def __init__(self, sender, interval=config.RELAY_INTERVAL):
+        self.sender = sender
+        self.interval = interval
+        self.teams = {}    # chat_id -> (alive_mask, frozenset user_id живых мафиози)
+        self.windows = {}  # (chat_id, user_id) -> [игра, имя, накопленные строки, таймер]
+
+    def team(self, game):
+        cached = self.teams.get(game.chat_id)
+        if cached is None or cached[0] != game.alive_mask:
+            members = frozenset(uid for role in MAFIA_ROLES for uid in game.get_players_by_role(role, alive_only=True))
+            cached = self.teams[game.chat_id] = (game.alive_mask, members)
+        return cached[1]
+
+    def post(self, game, user_id, text):
+        key = (game.chat_id, user_id)
+        window = self.windows.get(key)
+        if window is None:
+            self._deliver(game, user_id, game.players[user_id].name, [text])
+            self._open(key, game, game.players[user_id].name)
+            return
+        lines = window[2]
+        if sum(len(line) + 1 for line in lines) + len(text) > MESSAGE_LIMIT - 100:
+            # Склейка не влезет в одно сообщение: отправляем накопленное и копим заново
+            self._deliver(game, user_id, window[1], lines)
+            window[2] = lines = []
+        lines.append(text)
+
+    def forget(self, chat_id):
+        """Игра закончилась: отменяет склейки её игроков и забывает состав команды."""
+        self.teams.pop(chat_id, None)
+        for key in [key for key in self.windows if key[0] == chat_id]:
+            self.windows.pop(key)[3].cancel()
+
+    def close(self):
+        for window in self.windows.values():
+            window[3].cancel()
+        self.windows = {}
+
+    def _open(self, key, game, name):
+        handle = asyncio.get_event_loop().call_later(self.interval, self._flush, key)
+        self.windows[key] = [game, name, [], handle]
+
+    def _flush(self, key):
+        game, name, lines, _ = self.windows.pop(key)
+        if lines:
+            self._deliver(game, key[1], name, lines)
+            # Игрок ещё пишет: следующая пачка тоже не раньше чем через interval
+            self._open(key, game, name)
+
+    def _deliver(self, game, user_id, name, lines):
+        recipients = self.team(game) - {user_id}
+        if len(lines) == 1:
+            text = f"💬 Мафия {name}: {lines[0]}"
+        else:
+            text = f"💬 Мафия {name}:\n" + "\n".join(lines)
+            API_CALLS_SAVED.inc('batched', amount=(len(lines) - 1) * len(recipients))
+        for uid in recipients:
+            # Ошибки отправки SendQueue уже считает и логирует
+            self.sender.send_message(uid, text)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Таймеры фаз всех игр."""
+
+import asyncio
+import heapq
+
+from .logs import log
+
+# Один heap дедлайнов на все игры и одна задача-таймер. Фаза завершается либо
+# по дедлайну, либо досрочно через fire_now(), когда все нужные ходы сделаны.
+
+class PhaseScheduler:
+    def __init__(self):
+        self.heap = []      # (deadline, seq, chat_id)
+        self.pending = {}   # chat_id -> (seq, callback)
+        self.seq = 0
+        self.wakeup = None
+        self.task = None
+
+    def start(self):
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.get_event_loop().create_task(self._run())
+
+    async def close(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    def schedule(self, chat_id, timeout, callback):
+        """Через timeout секунд вызовет callback() (корутину); заменяет прежний таймер чата."""
+        self.seq += 1
+        self.pending[chat_id] = (self.seq, callback)
+        deadline = asyncio.get_event_loop().time() + timeout
+        if not self.heap or deadline < self.heap[0][0]:
+            self._wake()
+        heapq.heappush(self.heap, (deadline, self.seq, chat_id))
+        # Отменённые записи удаляются лениво; чистим, если их накопилось много
+        if len(self.heap) > 2 * len(self.pending) + 64:
+            self.heap = [e for e in self.heap if self._is_live(e)]
+            heapq.heapify(self.heap)
+
+    def cancel(self, chat_id):
+        return self.pending.pop(chat_id, None) is not None
+
+    def fire_now(self, chat_id):
+        entry = self.pending.pop(chat_id, None)
+        if entry:
+            self._fire(chat_id, entry[1])
+
+    def _is_live(self, item):
+        entry = self.pending.get(item[2])
+        return entry is not None and entry[0] == item[1]
+
+    def _wake(self):
+        if self.wakeup:
+            self.wakeup.set()
+
+    def _fire(self, chat_id, callback):
+        task = asyncio.get_event_loop().create_task(callback())
+        task.add_done_callback(lambda t: t.cancelled() or not t.exception() or
+                               log.error("Ошибка смены фазы в чате %s", chat_id, exc_info=t.exception()))
+
+    async def _run(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            while self.heap and not self._is_live(self.heap[0]):
+                heapq.heappop(self.heap)
+            timeout = self.heap[0][0] - loop.time() if self.heap else None
+            if timeout is None or timeout > 0:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, seq, chat_id = heapq.heappop(self.heap)
+            _, callback = self.pending.pop(chat_id)
+            self._fire(chat_id, callback)
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""Исходящие вызовы Telegram API: очередь с лимитами и склейка правок сообщений."""
+
+import asyncio
+from collections import deque
+
+from aiogram.utils.exceptions import NetworkError, RestartingTelegram, RetryAfter
+
+from . import config
+from .instruments import API_CALLS_SAVED, SEND_SECONDS
+from .logs import log
+
+# ===== ОЧЕРЕДЬ ИСХОДЯЩИХ СООБЩЕНИЙ =====
+# Все обращения к Telegram API из обработчиков идут через SendQueue:
+# несколько воркеров отправляют сообщения параллельно, а token bucket'ы
+# держат нас в пределах глобального лимита и лимитов отдельных чатов.
+# Воркер никогда не спит на лимите чата: если у чата кончились токены (или Telegram
+# велел подождать), его сообщения уходят в отдельную очередь чата и возвращаются
+# воркерам по таймеру, по одному на каждый новый токен. Остальные чаты их не ждут.
+
+class TokenBucket:
+    __slots__ = ('rate', 'capacity', 'tokens', 'stamp')
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.stamp = now
+
+    def reserve(self, now):
+        """Забирает токен и возвращает, сколько секунд нужно подождать перед отправкой."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def delay(self, now, count=1):
+        """Через сколько секунд накопится count токенов (0.0 — уже есть). Токены не забирает."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        return max(0.0, (min(count, self.capacity) - self.tokens) / self.rate)
+
+    def take(self, now):
+        """Забирает токен, если он есть (0.0), иначе возвращает, через сколько секунд он появится."""
+        delay = self.delay(now)
+        if not delay:
+            self.tokens -= 1
+        return delay
+
+    def hold(self, seconds, now):
+        """Ни одного токена ближайшие seconds секунд, а ровно через seconds — один."""
+        self.tokens = 1 - seconds * self.rate
+        self.stamp = now
+
+    def idle(self, now):
+        return self.tokens + (now - self.stamp) * self.rate >= self.capacity
+
+
+class SendQueue:
+    def __init__(self, bot=None, workers=config.SEND_WORKERS, max_retries=config.SEND_MAX_RETRIES):
+        self.bot = bot
+        self.workers = workers
+        self.max_retries = max_retries
+        self.queue = asyncio.Queue()
+        self.tasks = []
+        self.global_bucket = None
+        self.chat_buckets = {}
+        self.waiting = {}  # chat_id -> deque заданий, ждущих токена чата (пока есть, идёт таймер _wake)
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    def start(self):
+        loop = asyncio.get_event_loop()
+        self.global_bucket = TokenBucket(config.GLOBAL_RATE, config.GLOBAL_RATE, loop.time())
+        for _ in range(self.workers):
+            self.tasks.append(loop.create_task(self._worker()))
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def call(self, chat_id, method, *args, **kwargs):
+        """Ставит вызов method(*args, **kwargs) в очередь и возвращает future с его результатом."""
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        # Ошибку уже посчитали и залогировали в _fail, ждать результат не обязательно
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._enqueue((chat_id, method, args, kwargs, future, loop.time(), 0))
+        return future
+
+    def send_message(self, chat_id, text, **kwargs):
+        return self.call(chat_id, self.bot.send_message, chat_id, text, **kwargs)
+
+    def depth(self):
+        """Сколько вызовов ещё не отправлено: в общей очереди и в очередях чатов, ждущих лимита."""
+        return self.queue.qsize() + sum(len(waiting) for waiting in self.waiting.values())
+
+    def _enqueue(self, job):
+        # Пока чат ждёт токена, его новые сообщения встают за уже ждущими, а не обгоняют их
+        waiting = self.waiting.get(job[0])
+        if waiting is not None:
+            waiting.append(job)
+        else:
+            self.queue.put_nowait(job)
+
+    def _defer(self, loop, job, delay, first=False):
+        """Откладывает задание до токена его чата, не занимая воркер."""
+        waiting = self.waiting.get(job[0])
+        if waiting is None:
+            waiting = self.waiting[job[0]] = deque()
+            loop.call_later(delay, self._wake, job[0])
+        if first:
+            waiting.appendleft(job)
+        else:
+            waiting.append(job)
+
+    def _wake(self, chat_id):
+        waiting = self.waiting[chat_id]
+        self.queue.put_nowait(waiting.popleft())
+        if waiting:
+            # Появившийся токен достанется голове очереди, следующему нужен ещё один
+            loop = asyncio.get_event_loop()
+            delay = self._chat_bucket(chat_id, loop.time()).delay(loop.time(), 2)
+            loop.call_later(delay, self._wake, chat_id)
+        else:
+            del self.waiting[chat_id]
+
+    def _chat_bucket(self, chat_id, now):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self.chat_buckets) > 10000:
+                self.chat_buckets = {cid: b for cid, b in self.chat_buckets.items() if not b.idle(now)}
+            # В группах (отрицательный chat_id) лимит ~20 сообщений в минуту, в личке ~1 в секунду
+            if chat_id < 0:
+                bucket = TokenBucket(config.GROUP_RATE, config.GROUP_BURST, now)
+            else:
+                bucket = TokenBucket(config.PRIVATE_RATE, config.PRIVATE_BURST, now)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def _worker(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            job = await self.queue.get()
+            try:
+                await self._process(loop, job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("Ошибка воркера очереди отправки")
+            finally:
+                self.queue.task_done()
+
+    async def _process(self, loop, job):
+        chat_id, method, args, kwargs, future, enqueued, attempt = job
+        if future.cancelled():
+            return
+        delay = self._chat_bucket(chat_id, loop.time()).take(loop.time())
+        if delay:
+            self._defer(loop, job, delay)
+            return
+        # Глобальный лимит общий для всех чатов, тут ждать воркеру не зазорно
+        delay = self.global_bucket.reserve(loop.time())
+        if delay:
+            await asyncio.sleep(delay)
+        try:
+            result = await method(*args, **kwargs)
+        except RetryAfter as e:
+            if attempt < self.max_retries:
+                self.retried += 1
+                # Telegram сам сказал, сколько ждать: придерживаем этот чат и повторяем
+                bucket = self._chat_bucket(chat_id, loop.time())
+                bucket.hold(e.timeout, loop.time())
+                self._defer(loop, (chat_id, method, args, kwargs, future, enqueued, attempt + 1),
+                            bucket.delay(loop.time()), first=True)
+                return
+            self._fail(future, e, chat_id)
+        except (NetworkError, RestartingTelegram, asyncio.TimeoutError) as e:
+            if attempt < self.max_retries:
+                self.retried += 1
+                loop.call_later(0.5 * 2 ** attempt, self._enqueue,
+                                (chat_id, method, args, kwargs, future, enqueued, attempt + 1))
+                return
+            self._fail(future, e, chat_id)
+        except Exception as e:
+            self._fail(future, e, chat_id)
+        else:
+            latency = loop.time() - enqueued
+            self.sent += 1
+            SEND_SECONDS.observe(latency)
+            if not future.done():
+                future.set_result(result)
+
+    def _fail(self, future, error, chat_id):
+        self.failed += 1
+        log.warning("Не удалось отправить в чат %s: %s", chat_id, error)
+        if not future.done():
+            future.set_exception(error)
+
+
+# ===== ПРАВКА СООБЩЕНИЙ =====
+# Telegram ограничивает правки так же, как отправку, поэтому частые обновления
+# одного сообщения копятся: уходит только последняя версия, не чаще раза в interval.
+
+class MessageEditor:
+    def __init__(self, sender, interval=config.EDIT_INTERVAL):
+        self.sender = sender
+        self.interval = interval
+        self.pending = {}  # (chat_id, message_id) -> [текст, kwargs, таймер]
+
+    def edit(self, chat_id, message_id, text, **kwargs):
+        key = (chat_id, message_id)
+        entry = self.pending.get(key)
+        if entry:
+            entry[0], entry[1] = text, kwargs
+            API_CALLS_SAVED.inc('coalesced')
+            return
+        handle = asyncio.get_event_loop().call_later(self.interval, self._flush, key)
+        self.pending[key] = [text, kwargs, handle]
+
+    def finish(self, chat_id, message_id, text, **kwargs):
+        """Последняя правка сообщения: отменяет отложенную и отправляет сразу."""
+        self.cancel(chat_id, message_id)
+        self._send(chat_id, message_id, text, kwargs)
+
+    def cancel(self, chat_id, message_id):
+        entry = self.pending.pop((chat_id, message_id), None)
+        if entry:
+            entry[2].cancel()
+
+    def close(self):
+        for entry in self.pending.values():
+            entry[2].cancel()
+        self.pending = {}
+
+    def _flush(self, key):
+        text, kwargs, _ = self.pending.pop(key)
+        self._send(key[0], key[1], text, kwargs)
+
+    def _send(self, chat_id, message_id, text, kwargs):
+        self.sender.call(chat_id, self.sender.bot.edit_message_text, text, chat_id, message_id, **kwargs)
@@ -0,0 +1,506 @@
+# -*- coding: utf-8 -*-
+"""Хранилища снимков игр (память, SQLite, Redis), журнал событий и FSM-хранилище aiogram."""
+
+import asyncio
+import json
+import sqlite3
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from mafia_engine import EventLog
+
+from . import config
+from .logs import log
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis нужен только при REDIS_URL
+    aioredis = None
+
+STALE = -1  # версия локальной копии, которую нужно перечитать из хранилища
+PLAYER_TTL = 7 * 86400  # сколько помнить, в какой игре игрок (дольше любой партии)
+
+# ===== ХРАНИЛИЩЕ ИГР =====
+# Игры сохраняются при смене фазы (а не на каждое нажатие кнопки): save()
+# только запоминает свежий снимок, а flush() пишет накопленное одной транзакцией.
+
+class GameStore:
+    """Хранилище, которое ничего не сохраняет (используется, если не заданы ни REDIS_URL, ни STORE_PATH)."""
+
+    # Общее хранилище нескольких реплик (shared = True) держит каждую команду чата
+    # под его замком: acquire() перед командой, release() после неё.
+    shared = False
+
+    async def load_all(self):
+        return []
+
+    def save(self, game):
+        pass
+
+    def delete(self, chat_id):
+        pass
+
+    async def flush(self):
+        pass
+
+    def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def acquire(self, chat_id):
+        """Берёт замок чата. (True, снимок или None) — локальная копия игры устарела, иначе (False, None)."""
+        return False, None
+
+    async def release(self, chat_id):
+        """Записывает сделанные под замком изменения игры и отпускает замок."""
+
+    async def player_chat(self, user_id):
+        """chat_id игры игрока по общему хранилищу (None — неизвестно)."""
+        return None
+
+
+class BufferedGameStore(GameStore):
+    """Копит снимки в dirty и раз в flush_interval отдаёт их пачкой в _write()."""
+
+    def __init__(self, flush_interval=config.STORE_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self.dirty = {}  # chat_id -> JSON или None (удалить)
+        self.task = None
+
+    def save(self, game):
+        self.dirty[game.chat_id] = json.dumps(game.to_dict(), ensure_ascii=False, separators=(',', ':'))
+
+    def delete(self, chat_id):
+        self.dirty[chat_id] = None
+
+    async def flush(self):
+        if not self.dirty:
+            return
+        batch, self.dirty = self.dirty, {}
+        try:
+            await self._write(batch)
+        except Exception:
+            # Не теряем снимки: повторим со следующим flush, если их не перекрыли более свежие
+            for chat_id, data in batch.items():
+                self.dirty.setdefault(chat_id, data)
+            raise
+
+    async def _write(self, batch):
+        raise NotImplementedError
+
+    def start(self):
+        self.task = asyncio.get_event_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                log.exception("Не удалось сохранить игры")
+
+    async def close(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        await self.flush()
+
+
+class MemoryGameStore(BufferedGameStore):
+    """Снимки в памяти процесса: та же семантика, что у настоящих хранилищ, для проверок и бенчмарков."""
+
+    def __init__(self, flush_interval=config.STORE_FLUSH_INTERVAL):
+        super().__init__(flush_interval)
+        self.data = {}
+
+    async def load_all(self):
+        return [json.loads(data) for data in self.data.values()]
+
+    async def _write(self, batch):
+        for chat_id, data in batch.items():
+            if data is None:
+                self.data.pop(chat_id, None)
+            else:
+                self.data[chat_id] = data
+
+
+class SQLiteGameStore(BufferedGameStore):
+    def __init__(self, path, flush_interval=config.STORE_FLUSH_INTERVAL):
+        super().__init__(flush_interval)
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS games (chat_id INTEGER PRIMARY KEY, data TEXT NOT NULL)")
+        self.conn.commit()
+        # Один поток: записи в SQLite идут строго по очереди и не блокируют event loop
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    async def load_all(self):
+        return [json.loads(data) for (data,) in self.conn.execute("SELECT data FROM games")]
+
+    async def _write(self, batch):
+        await asyncio.get_event_loop().run_in_executor(self.executor, self._write_sync, batch)
+
+    def _write_sync(self, batch):
+        upserts = [(cid, data) for cid, data in batch.items() if data is not None]
+        deletes = [(cid,) for cid, data in batch.items() if data is None]
+        with self.conn:
+            if upserts:
+                self.conn.executemany("INSERT OR REPLACE INTO games (chat_id, data) VALUES (?, ?)", upserts)
+            if deletes:
+                self.conn.executemany("DELETE FROM games WHERE chat_id = ?", deletes)
+
+    async def close(self):
+        await super().close()
+        self.executor.shutdown()
+        self.conn.close()
+
+
+class RedisGameStore(BufferedGameStore):
+    """Игры в Redis (или любом сервере с его протоколом): общее хранилище для нескольких реплик.
+
+    Любая реплика может получить апдейт любого чата, поэтому каждая команда чата идёт
+    под его замком (acquire/release): замок — ключ с меткой реплики и сроком lease,
+    под ним реплика сверяет версию игры, при необходимости перечитывает снимок,
+    а в release записывает изменения и отпускает замок одной транзакцией MULTI/EXEC.
+    Версия растёт при каждой записи; запись идёт под WATCH версий, и снимок не затирает
+    игру, которую изменила другая реплика (например, когда истёк срок замка) — тогда
+    локальная копия помечается устаревшей и перечитывается при следующей команде.
+    client — redis.asyncio.Redis или совместимый (например, fakeredis.aioredis.FakeRedis).
+    """
+
+    shared = True
+
+    def __init__(self, client, prefix='mafia', flush_interval=config.STORE_FLUSH_INTERVAL, max_attempts=5,
+                 lease=config.STORE_LEASE):
+        super().__init__(flush_interval)
+        self.redis = client
+        self.prefix = prefix
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self.token = uuid.uuid4().hex  # метка этой реплики в замках чатов
+        self.versions = {}  # chat_id -> версия, которую мы последней видели или записали (STALE — перечитать)
+        self.rosters = {}   # chat_id -> состав игры, записанный в хранилище
+        self.members = {}   # chat_id -> новый состав, который ещё не записан
+        self.seen = {}      # chat_id -> снимок, который мы последним прочитали или записали
+        self.locked = set()
+        self.conflicts = 0
+        self.events = RedisEventLog()  # журнал событий, если его включил make_event_log()
+
+    def _data_key(self, chat_id):
+        return f'{self.prefix}:game:{chat_id}'
+
+    def _version_key(self, chat_id):
+        return f'{self.prefix}:ver:{chat_id}'
+
+    def _lock_key(self, chat_id):
+        return f'{self.prefix}:lock:{chat_id}'
+
+    def _player_key(self, user_id):
+        return f'{self.prefix}:player:{user_id}'
+
+    def _events_key(self):
+        return f'{self.prefix}:events'
+
+    def save(self, game):
+        super().save(game)
+        # Ключи игроков переписываем, только когда меняется состав
+        roster = frozenset(game.players)
+        if roster != self.rosters.get(game.chat_id):
+            self.members[game.chat_id] = roster
+
+    async def load_all(self):
+        chat_ids = [int(cid) for cid in await self.redis.smembers(f'{self.prefix}:games')]
+        if not chat_ids:
+            return []
+        # Снимки и версии одним обращением к серверу
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.mget([self._data_key(cid) for cid in chat_ids])
+            pipe.mget([self._version_key(cid) for cid in chat_ids])
+            snapshots, versions = await pipe.execute()
+        result = []
+        for chat_id, data, version in zip(chat_ids, snapshots, versions):
+            if data is not None:
+                data = data.decode() if isinstance(data, bytes) else data
+                self.versions[chat_id] = int(version or 0)
+                self.seen[chat_id] = data
+                snapshot = json.loads(data)
+                self.rosters[chat_id] = frozenset(p[0] for p in snapshot['players'])
+                result.append(snapshot)
+        return result
+
+    async def player_chat(self, user_id):
+        chat_id = await self.redis.get(self._player_key(user_id))
+        return int(chat_id) if chat_id is not None else None
+
+    async def acquire(self, chat_id):
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + self.lease
+        while True:
+            # Версию читаем в том же обращении: если замок наш, она уже не изменится
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.set(self._lock_key(chat_id), self.token, nx=True, px=int(self.lease * 1000))
+                pipe.get(self._version_key(chat_id))
+                locked, version = await pipe.execute()
+            if locked:
+                break
+            if loop.time() > deadline:
+                raise RuntimeError(f"Чат {chat_id} занят другой репликой дольше {self.lease} с")
+            await asyncio.sleep(0.01)
+        self.locked.add(chat_id)
+        version = int(version or 0)
+        if version == self.versions.get(chat_id, 0):
+            return False, None
+        data = await self.redis.get(self._data_key(chat_id))
+        self.versions[chat_id] = version
+        if data is None:
+            self.seen.pop(chat_id, None)
+            self.rosters.pop(chat_id, None)
+            return True, None
+        data = data.decode() if isinstance(data, bytes) else data
+        self.seen[chat_id] = data
+        snapshot = json.loads(data)
+        self.rosters[chat_id] = frozenset(p[0] for p in snapshot['players'])
+        return True, snapshot
+
+    async def release(self, chat_id):
+        if chat_id not in self.locked:
+            return
+        self.locked.discard(chat_id)
+        batch = {}
+        if chat_id in self.dirty:
+            data = self.dirty.pop(chat_id)
+            if data is None or data != self.seen.get(chat_id):
+                batch[chat_id] = data
+            else:
+                self.members.pop(chat_id, None)  # команда ничего не изменила
+        try:
+            await self._write(batch, unlock=chat_id)
+        except Exception:
+            for cid, data in batch.items():
+                self.dirty.setdefault(cid, data)
+            raise
+
+    async def flush(self):
+        if not self.dirty and self.events.buffer:
+            await self._write({})
+        else:
+            await super().flush()
+
+    async def _write(self, batch, unlock=None):
+        events = self.events.take()
+        try:
+            await self._write_games(batch, unlock, events)
+        except Exception:
+            self.events.restore(events)
+            raise
+
+    async def _write_games(self, batch, unlock, events):
+        from redis.exceptions import WatchError
+        chat_ids = list(batch)
+        version_keys = [self._version_key(cid) for cid in chat_ids]
+        watched = list(version_keys)
+        if unlock is not None:
+            watched.append(self._lock_key(unlock))
+        for _ in range(self.max_attempts):
+            async with self.redis.pipeline(transaction=True) as pipe:
+                try:
+                    await pipe.watch(*watched)
+                    current = await pipe.mget(version_keys) if version_keys else []
+                    owned = False
+                    if unlock is not None:
+                        owner = await pipe.get(self._lock_key(unlock))
+                        owned = owner is not None and (owner.decode() if isinstance(owner, bytes) else owner) == self.token
+                    pipe.multi()
+                    written = {}
+                    members = {}
+                    for chat_id, version in zip(chat_ids, current):
+                        version = int(version or 0)
+                        if version != self.versions.get(chat_id, 0) or (chat_id == unlock and not owned):
+                            self.conflicts += 1
+                            log.warning("Игру в чате %s изменила другая реплика, снимок не записан", chat_id)
+                            written[chat_id] = STALE
+                            continue
+                        data = batch[chat_id]
+                        # Версия не удаляется вместе с игрой: новая игра в этом чате продолжит счёт,
+                        # и реплика со старой копией не примет её за свою
+                        pipe.incr(self._version_key(chat_id))
+                        if data is None:
+                            pipe.delete(self._data_key(chat_id))
+                            pipe.srem(f'{self.prefix}:games', chat_id)
+                        else:
+                            pipe.set(self._data_key(chat_id), data)
+                            pipe.sadd(f'{self.prefix}:games', chat_id)
+                            roster = self.members.get(chat_id)
+                            if roster is not None:
+                                members[chat_id] = roster
+                                for uid in roster:
+                                    pipe.set(self._player_key(uid), chat_id, ex=PLAYER_TTL)
+                        written[chat_id] = version + 1
+                    if events:
+                        # События пишем до снятия замка в той же транзакции: следующая реплика
+                        # допишет события этой игры в поток только после них
+                        pipe.xadd(self._events_key(), {'events': RedisEventLog.dumps(events)})
+                    if owned:
+                        pipe.delete(self._lock_key(unlock))
+                    await pipe.execute()
+                except WatchError:
+                    # Версию тронули между MGET и EXEC — перечитываем и пробуем снова
+                    continue
+            for chat_id, version in written.items():
+                self.versions[chat_id] = version
+                if version == STALE or batch[chat_id] is None:
+                    self.seen.pop(chat_id, None)
+                    self.rosters.pop(chat_id, None)
+                    self.members.pop(chat_id, None)
+                    continue
+                self.seen[chat_id] = batch[chat_id]
+                if chat_id in members:
+                    self.rosters[chat_id] = members[chat_id]
+                    if self.members.get(chat_id) is members[chat_id]:
+                        del self.members[chat_id]
+            return
+        raise RuntimeError(f"Не удалось записать {len(batch)} игр: версии постоянно меняются")
+
+    async def close(self):
+        await super().close()
+        await self.redis.aclose()
+
+
+def make_store():
+    """Хранилище игр по настройкам: Redis, если задан REDIS_URL, иначе SQLite или ничего."""
+    if config.REDIS_URL:
+        if aioredis is None:
+            raise RuntimeError("Для REDIS_URL нужен пакет redis: pip install redis")
+        return RedisGameStore(aioredis.from_url(config.REDIS_URL))
+    if config.STORE_PATH:
+        return SQLiteGameStore(config.STORE_PATH)
+    return GameStore()
+
+
+# ===== ЖУРНАЛ СОБЫТИЙ =====
+# События копятся в памяти и раз в flush_interval уходят в файл из отдельного потока,
+# чтобы запись на диск не задерживала обработку апдейтов.
+
+class AsyncEventLog(EventLog):
+    def __init__(self, path, flush_interval=config.STORE_FLUSH_INTERVAL):
+        super().__init__(path, batch_size=None)
+        self.flush_interval = flush_interval
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.task = None
+
+    async def flush_async(self):
+        batch = self.take()
+        if batch:
+            await asyncio.get_event_loop().run_in_executor(self.executor, self.write, batch)
+
+    def start(self):
+        self.task = asyncio.get_event_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush_async()
+            except Exception:
+                log.exception("Не удалось записать журнал событий")
+
+    async def aclose(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        await self.flush_async()
+        self.executor.shutdown()
+        self.close()
+
+
+class RedisEventLog:
+    """Журнал событий в потоке Redis {prefix}:events, общий для всех реплик.
+
+    Команды одной игры могут обрабатывать разные реплики, и файлы реплик разорвали бы
+    её журнал. Поэтому события копятся здесь и уходят в поток в той же транзакции,
+    что снимает замок чата (RedisGameStore.release): события игры лежат в потоке
+    в том порядке, в каком её меняли. В файл для replay и analytics поток выгружает
+    export_events().
+    """
+
+    def __init__(self):
+        self.buffer = []
+
+    def __call__(self, event):
+        self.buffer.append(event)
+
+    def take(self):
+        batch, self.buffer = self.buffer, []
+        return batch
+
+    def restore(self, batch):
+        """Возвращает не записанную пачку в начало буфера."""
+        self.buffer[:0] = batch
+
+    @staticmethod
+    def dumps(batch):
+        return ''.join(json.dumps(e, ensure_ascii=False, separators=(',', ':')) + '\n' for e in batch)
+
+    def start(self):
+        pass
+
+    async def aclose(self):
+        pass  # остаток буфера записывает store.close()
+
+
+async def export_events(client, path, prefix='mafia', trim=False, page=1000):
+    """Дописывает события из потока Redis в журнал path (JSONL, .gz — сжатый). Возвращает число пачек.
+
+    trim=True удаляет выгруженное из потока, чтобы следующая выгрузка его не повторила.
+    """
+    key = f'{prefix}:events'
+    start = '-'
+    exported = 0
+    out = EventLog(path, batch_size=None)
+    try:
+        while True:
+            entries = await client.xrange(key, min=start, count=page)
+            if not entries:
+                return exported
+            for _, fields in entries:
+                data = fields.get(b'events', fields.get('events'))
+                out.file.write(data.decode() if isinstance(data, bytes) else data)
+            out.file.flush()
+            ids = [entry_id for entry_id, _ in entries]
+            if trim:
+                await client.xdel(key, *ids)
+            last = ids[-1]
+            start = '(' + (last.decode() if isinstance(last, bytes) else last)
+            exported += len(entries)
+    finally:
+        out.close()
+
+
+def make_event_log(store=None):
+    """Журнал событий по настройкам (None, если EVENT_LOG_PATH пуст).
+
+    С общим хранилищем (REDIS_URL) события пишутся не в EVENT_LOG_PATH, а в поток Redis
+    рядом с играми (RedisEventLog): локальный файл каждой реплики содержал бы обрывки игр.
+    """
+    if not config.EVENT_LOG_PATH:
+        return None
+    if store is not None and store.shared:
+        return store.events
+    return AsyncEventLog(config.EVENT_LOG_PATH)
+
+
+def make_fsm_storage():
+    """FSM-хранилище aiogram: общий Redis для нескольких реплик или память процесса."""
+    if config.REDIS_URL:
+        from aiogram.contrib.fsm_storage.redis import RedisStorage2
+        url = urlsplit(config.REDIS_URL)
+        return RedisStorage2(url.hostname or 'localhost', url.port or 6379, db=int(url.path.strip('/') or 0),
+                             password=url.password, ssl=url.scheme == 'rediss', prefix='mafia:fsm')
+    from aiogram.contrib.fsm_storage.memory import MemoryStorage
+    return MemoryStorage()
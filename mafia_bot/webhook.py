@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Приём апдейтов через webhook.
+
+Telegram получает 200 сразу, а апдейт ставится в ограниченную очередь, которую
+разбирают воркеры. Если очередь полна дольше WEBHOOK_PUT_TIMEOUT, отвечаем 503 —
+Telegram повторит доставку позже, так что апдейты не теряются.
+"""
+
+import asyncio
+import ipaddress
+import signal
+from urllib.parse import urlsplit
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher, types
+
+from . import config, handlers
+from .logs import log
+
+
+class WebhookServer:
+    def __init__(self, dp, path, secret=None, queue_size=config.UPDATE_QUEUE_SIZE, workers=config.UPDATE_WORKERS):
+        self.dp = dp
+        self.path = path
+        self.secret = secret
+        self.queue = asyncio.Queue(queue_size)
+        self.workers = workers
+        self.tasks = []
+        self.received = 0
+        self.rejected = 0
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        return app
+
+    async def handle(self, request):
+        if self.secret and request.headers.get('X-Telegram-Bot-Api-Secret-Token') != self.secret:
+            return web.Response(status=401)
+        try:
+            data = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        try:
+            await asyncio.wait_for(self.queue.put(data), config.WEBHOOK_PUT_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return web.Response(status=503, headers={'Retry-After': '1'})
+        self.received += 1
+        return web.Response()
+
+    def start(self):
+        loop = asyncio.get_event_loop()
+        for _ in range(self.workers):
+            self.tasks.append(loop.create_task(self._worker()))
+
+    async def close(self):
+        # Сначала дорабатываем то, что Telegram уже считает доставленным
+        await self.queue.join()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def _worker(self):
+        while True:
+            data = await self.queue.get()
+            try:
+                await self.dp.process_update(types.Update(**data))
+            except Exception:
+                log.exception("Ошибка обработки апдейта")
+            finally:
+                self.queue.task_done()
+
+
+def is_loopback(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:  # имя хоста или пустая строка (все интерфейсы)
+        return False
+
+
+def run_webhook(dp):
+    url = config.WEBHOOK_URL
+    if not config.WEBHOOK_SECRET and (url or not is_loopback(config.WEBHOOK_HOST)):
+        # Иначе любой, кто достучится до порта, может слать боту поддельные апдейты (хоть /stop
+        # от имени админа). Секрет не генерируем: у всех реплик за балансировщиком он должен быть один
+        raise RuntimeError("для WEBHOOK_URL или WEBHOOK_HOST не на loopback задайте WEBHOOK_SECRET "
+                           "(A-Z, a-z, 0-9, _ и -, до 256 символов)")
+    path = (urlsplit(url).path or '/') if url else '/webhook'
+    server = WebhookServer(dp, path, config.WEBHOOK_SECRET)
+
+    async def main():
+        Bot.set_current(dp.bot)
+        Dispatcher.set_current(dp)
+        await handlers.start_services()
+        server.start()
+        runner = web.AppRunner(server.app(), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, config.WEBHOOK_HOST, config.WEBHOOK_PORT).start()
+        # Без WEBHOOK_URL сервер работает только локально (например, для бенчмарка)
+        if url:
+            await dp.bot.set_webhook(url, secret_token=config.WEBHOOK_SECRET)
+        log.info("Webhook слушает %s:%s%s", config.WEBHOOK_HOST, config.WEBHOOK_PORT, path)
+        stop = asyncio.Event()
+        loop = asyncio.get_event_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        try:
+            await stop.wait()
+        finally:
+            await runner.cleanup()
+            await server.close()
+            await handlers.stop_services(dp)
+            await (await dp.bot.get_session()).close()
+
+    asyncio.run(main())
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+"""Движок Мафии: состояние игры и правила, без aiogram и токена бота."""
+
+from .eventlog import EventLog, read_events
+from .game import MafiaGame, Player, PlayerIndex, player_index
+from .roles import ALL_ROLES, MAFIA_ROLES, NIGHT_ROLES, ROLE_NAMES, Role
+
+__all__ = [
+    'ALL_ROLES', 'MAFIA_ROLES', 'NIGHT_ROLES', 'ROLE_NAMES',
+    'EventLog', 'MafiaGame', 'Player', 'PlayerIndex', 'Role',
+    'player_index', 'read_events',
+]
@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""Статистика баланса ролей: исходы и доля побед по ролям, числу игроков и местам.
+
+Партии берутся из журналов событий (eventlog.py) или играются симулятором прямо
+здесь. Из партии нужны только раздача и итог; они копятся пачками по chunk партий
+и сводятся в счётчики NumPy, так что память не растёт с числом партий. Журналы
+и куски симуляции считаются в пуле процессов. Несжатый журнал делится по байтам
+на куски по числу процессов, так что и один большой файл считается параллельно;
+сжатый (.gz) читается только подряд, поэтому каждый .gz — один процесс.
+
+    python -m mafia_engine.analytics mafia_events.jsonl sim.*.jsonl.gz --processes 4
+    python -m mafia_engine.analytics --simulate 1000000 --policy team --processes 8 --csv stats/
+
+Нужен numpy (pip install numpy); сам движок от него не зависит.
+"""
+
+import argparse
+import csv
+import os
+import random
+import time
+from multiprocessing import Pool
+
+from .eventlog import read_events
+from .roles import MAFIA_ROLES, Role
+from .simulator import POLICIES, play_game
+
+try:
+    import numpy as np
+except ImportError:  # numpy нужен только этой команде
+    np = None
+
+MAX_SEATS = 20
+CHUNK = 10000
+MIN_SPAN = 16 << 20  # кусок журнала меньше 16 МиБ не стоит отдельного процесса
+# Итоги check_winner; None — партия закончилась без победителя (лимит кругов, /stop)
+OUTCOMES = ('мирные', 'мафия', 'маньяк', 'оборотень', 'никто', None)
+
+
+def team_of(role):
+    """Исход check_winner, который считается победой игрока с этой ролью."""
+    if role in MAFIA_ROLES:
+        return 'мафия'
+    if role == Role.MANIAC:
+        return 'маньяк'
+    if role == Role.WEREWOLF:
+        return 'оборотень'
+    return 'мирные'
+
+
+def outcome_label(outcome):
+    return outcome or 'без победителя'
+
+
+class Stats:
+    """Счётчики по партиям; складываются через merge(), поэтому считаются по частям."""
+
+    def __init__(self):
+        roles, outcomes = len(Role), len(OUTCOMES)
+        self.outcomes = np.zeros((MAX_SEATS + 1, outcomes), np.int64)  # игроков × исход
+        self.role_games = np.zeros((MAX_SEATS + 1, roles), np.int64)   # игроков × роль: сколько раз раздана
+        self.role_wins = np.zeros((MAX_SEATS + 1, roles), np.int64)    # ... и сколько раз её команда победила
+        self.seat_games = np.zeros((MAX_SEATS, roles), np.int64)       # место × роль
+        self.seat_wins = np.zeros((MAX_SEATS, roles), np.int64)
+        self.presence = np.zeros((roles, outcomes), np.int64)          # роль была в партии × исход
+        self.team = np.array([OUTCOMES.index(team_of(role)) for role in Role])
+
+    @property
+    def games(self):
+        return int(self.outcomes.sum())
+
+    def add(self, deals, winners):
+        """deals — роли по местам (партий × MAX_SEATS, -1 — место пусто), winners — индексы OUTCOMES."""
+        dealt = deals >= 0
+        players = dealt.sum(axis=1)
+        np.add.at(self.outcomes, (players, winners), 1)
+
+        games, seats = np.nonzero(dealt)
+        roles = deals[games, seats]
+        won = self.team[roles] == winners[games]
+        np.add.at(self.role_games, (players[games], roles), 1)
+        np.add.at(self.role_wins, (players[games[won]], roles[won]), 1)
+        np.add.at(self.seat_games, (seats, roles), 1)
+        np.add.at(self.seat_wins, (seats[won], roles[won]), 1)
+
+        # Роль учитываем один раз на партию, даже если её раздали нескольким (мафия, мирные)
+        present = np.zeros((len(deals), len(Role)), bool)
+        present[games, roles] = True
+        onehot = np.zeros((len(deals), len(OUTCOMES)), np.int64)
+        onehot[np.arange(len(deals)), winners] = 1
+        self.presence += present.T.astype(np.int64) @ onehot
+
+    def merge(self, other):
+        for name in ('outcomes', 'role_games', 'role_wins', 'seat_games', 'seat_wins', 'presence'):
+            getattr(self, name)[:] += getattr(other, name)
+        return self
+
+
+class Batch:
+    """Копит раздачи и итоги партий в готовых массивах и сбрасывает их в Stats по chunk штук."""
+
+    def __init__(self, stats, chunk=CHUNK):
+        self.stats = stats
+        self.deals = np.full((chunk, MAX_SEATS), -1, np.int8)
+        self.winners = np.zeros(chunk, np.int8)
+        self.size = 0
+
+    def append(self, deal, winner):
+        row = self.deals[self.size]
+        for seat, role in enumerate(deal):
+            if role is not None:
+                row[seat] = role
+        self.winners[self.size] = OUTCOMES.index(winner)
+        self.size += 1
+        if self.size == len(self.winners):
+            self.flush()
+
+    def flush(self):
+        if self.size:
+            self.stats.add(self.deals[:self.size], self.winners[:self.size])
+            self.deals.fill(-1)
+            self.size = 0
+
+
+class DealCollector:
+    """Приёмник событий MafiaGame, который запоминает только раздачу и итог партии."""
+
+    def __init__(self, batch):
+        self.batch = batch
+        self.deal = None
+
+    def __call__(self, event):
+        if event[1] == 'deal':
+            self.deal = event[2]
+        elif event[1] == 'end' and self.deal is not None:
+            self.batch.append(self.deal, event[2])
+            self.deal = None
+
+
+def log_stats(path, chunk=CHUNK):
+    """Stats по журналу событий: учитываются партии, дошедшие до раздачи и завершения."""
+    return log_part(path, chunk)[0]
+
+
+def log_part(path, chunk=CHUNK, span=None):
+    """Stats по куску журнала (span — байты, как в read_events) и партии, разрезанные его границами.
+
+    Возвращает (stats, deals, ends): deals — раздачи без итога в куске {seed: раздача},
+    ends — итоги, раздача которых была в предыдущих кусках, [(seed, итог)]. Их сводит stitch().
+    """
+    stats = Stats()
+    batch = Batch(stats, chunk)
+    deals, ends = {}, []  # seed -> раздача незавершённых партий
+    orphans = span is not None and span[0] > 0
+    for event in read_events(path, ('deal', 'end'), span):
+        if event[1] == 'deal':
+            deals[event[0]] = event[2]
+        else:
+            deal = deals.pop(event[0], None)
+            if deal is not None:
+                batch.append(deal, event[2])
+            elif orphans:
+                ends.append((event[0], event[2]))
+    batch.flush()
+    return stats, deals, ends
+
+
+def stitch(parts, chunk=CHUNK):
+    """Складывает результаты log_part по кускам одного журнала (по порядку файла) в одни Stats."""
+    total = Stats()
+    batch = Batch(total, chunk)
+    deals = {}
+    for stats, part_deals, ends in parts:
+        total.merge(stats)
+        for seed, winner in ends:
+            deal = deals.pop(seed, None)
+            if deal is not None:
+                batch.append(deal, winner)
+        deals.update(part_deals)
+    batch.flush()
+    return total
+
+
+def log_jobs(path, chunk=CHUNK, parts=1):
+    """Задачи для collect() по журналу: несжатый делится на parts кусков по байтам, но не мельче MIN_SPAN."""
+    size = 0 if path.endswith('.gz') else os.path.getsize(path)
+    parts = max(1, min(parts, size // MIN_SPAN))
+    if parts == 1:
+        return [('log', (path, chunk, None))]
+    bounds = [size * i // parts for i in range(parts + 1)]
+    return [('log', (path, chunk, (bounds[i], bounds[i + 1]))) for i in range(parts)]
+
+
+def simulation_stats(games, min_players=4, max_players=20, policy='random', seed=None, chunk=CHUNK):
+    """Stats по games партиям симулятора (тот же прогон, что simulator.simulate с этим seed)."""
+    stats = Stats()
+    batch = Batch(stats, chunk)
+    collector = DealCollector(batch)
+    rng = random.Random(seed)
+    policy = POLICIES[policy]
+    for _ in range(games):
+        play_game(rng.randint(min_players, max_players), policy, rng, events=collector)
+    batch.flush()
+    return stats
+
+
+def _run_job(job):
+    kind, args = job
+    return log_part(*args) if kind == 'log' else simulation_stats(*args)
+
+
+def collect(jobs, processes=1):
+    """Считает задачи ('log', (path, chunk, span)) из log_jobs и ('sim', (games, ...)) и складывает их Stats.
+
+    Куски одного журнала сводятся stitch() в порядке задач, поэтому их порядок важен.
+    """
+    if processes > 1 and len(jobs) > 1:
+        with Pool(min(processes, len(jobs))) as pool:
+            results = pool.map(_run_job, jobs, chunksize=1)
+    else:
+        results = [_run_job(job) for job in jobs]
+    total = Stats()
+    logs = {}
+    for (kind, args), result in zip(jobs, results):
+        if kind == 'log':
+            logs.setdefault(args[0], []).append(result)
+        else:
+            total.merge(result)
+    for parts in logs.values():
+        total.merge(stitch(parts))
+    return total
+
+
+def _rate(wins, games):
+    return np.divide(wins, games, out=np.full(np.shape(wins), np.nan), where=games > 0)
+
+
+def tables(stats):
+    """Таблицы для подбора раздачи: список (имя, заголовок, строки)."""
+    labels = [outcome_label(o) for o in OUTCOMES]
+    result = []
+
+    rows = []
+    for players in range(MAX_SEATS + 1):
+        games = stats.outcomes[players].sum()
+        if games:
+            rows.append([players, games] + [f'{x:.4f}' for x in stats.outcomes[players] / games])
+    result.append(('outcomes_by_players', ['игроков', 'партий'] + labels, rows))
+
+    rows = []
+    games_with = stats.presence.sum(axis=1)
+    dealt = stats.role_games.sum(axis=0)
+    rates = _rate(stats.role_wins.sum(axis=0), dealt)
+    for role in Role:
+        if games_with[role]:
+            rows.append([role.label, team_of(role), dealt[role], f'{rates[role]:.4f}']
+                        + [f'{x:.4f}' for x in stats.presence[role] / games_with[role]])
+    result.append(('roles', ['роль', 'команда', 'раздана', 'побед'] + [f'исход: {x}' for x in labels], rows))
+
+    rows = []
+    rates = _rate(stats.role_wins, stats.role_games)
+    for players in range(MAX_SEATS + 1):
+        if stats.role_games[players].any():
+            rows.append([players] + ['' if np.isnan(x) else f'{x:.4f}' for x in rates[players]])
+    result.append(('role_wins_by_players', ['игроков'] + [role.label for role in Role], rows))
+
+    rows = []
+    seat_games = stats.seat_games.sum(axis=1)
+    rates = _rate(stats.seat_wins.sum(axis=1), seat_games)
+    for seat in range(MAX_SEATS):
+        if seat_games[seat]:
+            rows.append([seat + 1, seat_games[seat], f'{rates[seat]:.4f}'])
+    result.append(('seat_wins', ['место', 'партий', 'побед'], rows))
+    return result
+
+
+def print_table(header, rows):
+    cells = [[str(x) for x in header]] + [[str(x) for x in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(header))]
+    for row in cells:
+        print('  '.join(cell.rjust(width) for cell, width in zip(row, widths)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Статистика баланса ролей по журналам или симуляции")
+    parser.add_argument('logs', nargs='*', help="журналы событий (.jsonl, .jsonl.gz)")
+    parser.add_argument('--simulate', type=int, default=0, help="сыграть столько партий симулятором")
+    parser.add_argument('--min-players', type=int, default=4)
+    parser.add_argument('--max-players', type=int, default=20)
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='random')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk', type=int, default=CHUNK, help="партий в одной пачке NumPy")
+    parser.add_argument('--csv', metavar='DIR', help="сохранить полные таблицы в CSV")
+    args = parser.parse_args(argv)
+    if np is None:
+        parser.error("нужен numpy: pip install numpy")
+    if not args.logs and not args.simulate:
+        parser.error("укажите журналы или --simulate N")
+
+    jobs = [job for path in args.logs for job in log_jobs(path, args.chunk, args.processes)]
+    if args.simulate:
+        # Как simulator.simulate_parallel: по куску на процесс, сиды seed, seed + 1, ...
+        parts = max(1, args.processes)
+        for i in range(parts):
+            games = args.simulate // parts + (1 if i < args.simulate % parts else 0)
+            if games:
+                jobs.append(('sim', (games, args.min_players, args.max_players, args.policy, args.seed + i,
+                                     args.chunk)))
+
+    started = time.perf_counter()
+    stats = collect(jobs, args.processes)
+    elapsed = time.perf_counter() - started
+    print(f"партий: {stats.games} за {elapsed:.2f} с ({stats.games / elapsed:.0f} партий/с)")
+
+    for name, header, rows in tables(stats):
+        if args.csv:
+            os.makedirs(args.csv, exist_ok=True)
+            with open(os.path.join(args.csv, f'{name}.csv'), 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                writer.writerows(rows)
+        if name != 'role_wins_by_players':  # слишком широкая для консоли, только в CSV
+            print()
+            print_table(header, rows)
+
+
+if __name__ == '__main__':
+    main()
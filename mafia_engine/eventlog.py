@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""Журнал событий игр: append-only JSONL, по событию в строке.
+
+Событие — список [seed, вид, аргументы...], его пишет MafiaGame, если ей передан
+events. Виды: new, join, leave, deal, night, act, resolve, day, vote, death, end.
+Файлы с окончанием .gz пишутся и читаются сжатыми.
+"""
+
+import gzip
+import json
+import os
+
+
+def _open(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+class EventLog:
+    """Копит события в буфере и дописывает их в файл пачками по batch_size.
+
+    batch_size=None — писать только по явному flush() или пачками через take()/write().
+    """
+
+    def __init__(self, path, batch_size=1000):
+        self.path = path
+        self.batch_size = batch_size
+        self.buffer = []
+        self.file = _open(path, 'a')
+
+    def __call__(self, event):
+        self.buffer.append(event)
+        if self.batch_size and len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def take(self):
+        """Забирает накопленные события; буфер подменяется целиком, новые события идут уже в новый."""
+        batch, self.buffer = self.buffer, []
+        return batch
+
+    def write(self, batch):
+        """Пишет пачку в файл одним вызовом (можно из другого потока)."""
+        if batch:
+            self.file.write(''.join(json.dumps(e, ensure_ascii=False, separators=(',', ':')) + '\n' for e in batch))
+            self.file.flush()
+
+    def flush(self):
+        self.write(self.take())
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def part_path(path, i):
+    """sim.jsonl.gz -> sim.3.jsonl.gz: отдельный журнал для процесса или шарда i."""
+    directory, name = os.path.split(path)
+    stem, dot, ext = name.partition('.')
+    return os.path.join(directory, f'{stem}.{i}{dot}{ext}')
+
+
+def read_events(path, kinds=None, span=None):
+    """События журнала по одному: файл не читается в память целиком.
+
+    kinds — только события этих видов; остальные строки отбрасываются без разбора JSON.
+    span — (начало, конец) в байтах несжатого журнала: только строки, которые начинаются
+    в этом диапазоне. Так один большой журнал делится на куски между процессами.
+    """
+    if span is not None:
+        yield from _read_span(path, kinds, *span)
+        return
+    marks = [f'"{kind}"' for kind in kinds] if kinds else None
+    with _open(path, 'r') as f:
+        for line in f:
+            if not line.strip() or marks and not any(mark in line for mark in marks):
+                continue
+            event = json.loads(line)
+            if kinds is None or event[1] in kinds:
+                yield event
+
+
+def _read_span(path, kinds, start, end, block=1 << 20):
+    if path.endswith('.gz'):
+        raise ValueError("сжатый журнал читается только целиком")
+    marks = [f'"{kind}"' for kind in kinds] if kinds else None
+    with open(path, 'rb') as f:
+        if start:
+            # Строку, начатую до start, дочитывает предыдущий кусок
+            f.seek(start - 1)
+            start += len(f.readline()) - 1
+        pos = start
+        while pos < end:
+            # Блоками по целым строкам: построчное чтение байтов заметно медленнее
+            data = f.read(min(block, end - pos))
+            if not data:
+                break
+            if not data.endswith(b'\n'):
+                data += f.readline()
+            pos += len(data)
+            for line in data.decode('utf-8').split('\n'):
+                if not line.strip() or marks and not any(mark in line for mark in marks):
+                    continue
+                event = json.loads(line)
+                if kinds is None or event[1] in kinds:
+                    yield event
@@ -0,0 +1,434 @@
+# -*- coding: utf-8 -*-
+"""Игровая логика Мафии без зависимости от Telegram."""
+
+import random
+from operator import itemgetter
+
+from .roles import (ALL_ROLES, BLOCK, GUARD, IMMUNE_TO, INSPECT, KILL, NIGHT_ACTIONS, PROTECT,
+                    SACRIFICE, Role)
+
+class PlayerIndex(dict):
+    """user_id -> (chat_id, role, alive): быстрый поиск игры игрока из личных сообщений.
+
+    Если задан listener, он вызывается как listener(user_id, chat_id), когда игрок
+    попадает в игру или переходит в другую, и listener(user_id, None), когда выходит.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.listener = None
+
+    def __setitem__(self, user_id, entry):
+        old = self.get(user_id)
+        dict.__setitem__(self, user_id, entry)
+        if self.listener and (old is None or old[0] != entry[0]):
+            self.listener(user_id, entry[0])
+
+    def __delitem__(self, user_id):
+        dict.__delitem__(self, user_id)
+        if self.listener:
+            self.listener(user_id, None)
+
+
+player_index = PlayerIndex()
+
+
+class Player:
+    __slots__ = ('user_id', 'name', 'role', 'alive', 'seat')
+
+    def __init__(self, user_id, name, seat):
+        self.user_id = user_id
+        self.name = name
+        self.role = None
+        self.alive = True
+        self.seat = seat
+
+class MafiaGame:
+    # Игроки сидят на местах 0..19; кто жив и у кого какая роль хранится битовыми
+    # масками по местам, так что выборки по ролям и проверка победы — битовые операции.
+    #
+    # Случайность берётся только из seed игры, поэтому партию можно воспроизвести.
+    # Если задан events (например, EventLog), каждое изменение состояния уходит туда
+    # событием [seed, вид, аргументы...] — по журналу replay.py восстанавливает игру.
+    def __init__(self, chat_id, creator_id, seed=None, events=None):
+        self.chat_id = chat_id
+        self.creator_id = creator_id
+        self.seed = seed if seed is not None else random.getrandbits(63)
+        self.events = events
+        self.nights = 0  # сколько ночей разрешено: номер ночи входит в зерно её случайности
+        self.players = {}  # user_id -> Player
+        self.seats = []    # место -> Player (None, если игрок вышел посреди игры)
+        self.alive_mask = 0
+        self.role_masks = [0] * len(Role)
+        self.phase = 'registration'
+        self.night_actions = {}  # user_id -> цель
+        self.inspections = []    # (кто проверял, кого) за последнюю ночь
+        self.used_once = set()   # кто уже потратил одноразовое действие (снайпер)
+        self.day_votes = {}      # кто -> за кого
+        self.vote_counts = {}    # за кого -> сколько голосов, ведётся по мере голосования
+        self.vote_leader = None  # единоличный лидер голосования (None — голосов нет или ничья)
+        self.vote_top = 0        # сколько голосов у лидера (или у каждого из делящих первое место)
+        self.yakuza_avenged = False
+        self.generation = 0  # растёт, когда меняется состав живых: старые кнопки целей становятся недействительны
+        self.awaiting = set()  # кто ещё должен сходить в текущей фазе
+        self.deadline = None  # time.time(), когда закончится текущая фаза
+        if events is not None:
+            events([self.seed, 'new', chat_id, creator_id])
+
+    def rng(self, purpose):
+        """Генератор для одного случайного решения: зависит только от seed игры и purpose."""
+        return random.Random(f'{self.seed}:{purpose}')
+
+    def to_dict(self):
+        """Снимок состояния игры для хранилища (только JSON-совместимые типы)."""
+        return {
+            'chat_id': self.chat_id,
+            'creator_id': self.creator_id,
+            # Место храним явно: после ухода игрока посреди игры в seats остаются дыры,
+            # а кнопки с номерами мест, выданные до перезапуска, должны указывать на тех же
+            'players': [[p.user_id, p.name, p.role, p.alive, p.seat] for p in self.seats if p is not None],
+            'phase': self.phase,
+            'deadline': self.deadline,
+            'night_actions': list(self.night_actions.items()),
+            'used_once': list(self.used_once),
+            'day_votes': list(self.day_votes.items()),
+            'awaiting': list(self.awaiting),
+            'yakuza_avenged': self.yakuza_avenged,
+            'generation': self.generation,
+            'seed': self.seed,
+            'nights': self.nights,
+        }
+
+    @classmethod
+    def from_dict(cls, data, events=None):
+        game = cls(data['chat_id'], data['creator_id'], data['seed'])
+        for uid, name, role, alive, seat in data['players']:
+            p = Player(uid, name, seat)
+            game.players[uid] = p
+            game.seats.extend([None] * (p.seat + 1 - len(game.seats)))
+            game.seats[p.seat] = p
+            bit = 1 << p.seat
+            if role is not None:
+                p.role = Role(role)
+                game.role_masks[role] |= bit
+            p.alive = alive
+            if alive:
+                game.alive_mask |= bit
+            game._index_player(p)
+        game.phase = data['phase']
+        game.deadline = data['deadline']
+        game.night_actions = dict(data['night_actions'])
+        game.used_once = set(data['used_once'])
+        for voter, target in data['day_votes']:
+            game.cast_vote(voter, target)
+        game.awaiting = set(data['awaiting'])
+        game.yakuza_avenged = data['yakuza_avenged']
+        game.generation = data['generation']
+        game.nights = data['nights']
+        # Журнал подключаем в конце: восстановление — не новые события (а 'new' в журнале уже есть)
+        game.events = events
+        return game
+
+    def _index_player(self, p):
+        player_index[p.user_id] = (self.chat_id, p.role, p.alive)
+
+    def _unindex_player(self, user_id):
+        entry = player_index.get(user_id)
+        if entry and entry[0] == self.chat_id:
+            del player_index[user_id]
+
+    def _uids(self, mask):
+        # Для редких масок (роли) быстрее идти по установленным битам
+        seats = self.seats
+        uids = []
+        while mask:
+            low = mask & -mask
+            uids.append(seats[low.bit_length() - 1].user_id)
+            mask ^= low
+        return uids
+
+    def add_player(self, user_id, name):
+        if user_id not in self.players and len(self.players) < 20:
+            p = Player(user_id, name, len(self.seats))
+            self.players[user_id] = p
+            self.seats.append(p)
+            self.alive_mask |= 1 << p.seat
+            self._index_player(p)
+            if self.events is not None:
+                self.events([self.seed, 'join', user_id, name])
+            return True
+        return False
+
+    def remove_player(self, user_id):
+        p = self.players.pop(user_id, None)
+        if p is None:
+            return False
+        self._unindex_player(user_id)
+        if self.events is not None:
+            self.events([self.seed, 'leave', user_id])
+        if self.phase == 'registration':
+            # До раздачи ролей просто пересаживаем всех, чтобы места шли подряд
+            self.seats.remove(p)
+            for seat, other in enumerate(self.seats):
+                other.seat = seat
+            self.alive_mask = (1 << len(self.seats)) - 1
+        else:
+            self.seats[p.seat] = None
+            bit = 1 << p.seat
+            self.alive_mask &= ~bit
+            if p.role is not None:
+                self.role_masks[p.role] &= ~bit
+            self.night_actions.pop(user_id, None)
+            self.awaiting.discard(user_id)
+            self._forget_votes(user_id)
+        return True
+
+    def _forget_votes(self, user_id):
+        """Убирает голос вышедшего игрока и голоса за него, чтобы итог дня не указал на ушедшего."""
+        votes = {voter: target for voter, target in self.day_votes.items() if user_id not in (voter, target)}
+        if len(votes) == len(self.day_votes):
+            return
+        self.day_votes = votes
+        counts = {}
+        for target in votes.values():
+            counts[target] = counts.get(target, 0) + 1
+        self.vote_counts = counts
+        self._rescan_leader()
+
+    def release(self):
+        """Убирает игроков этой игры из глобального индекса (игра завершена)."""
+        for uid in self.players:
+            self._unindex_player(uid)
+
+    def finish(self, winner=None):
+        """Завершает игру: записывает итог в журнал и убирает игроков из индекса."""
+        if self.events is not None:
+            self.events([self.seed, 'end', winner])
+        self.release()
+
+    def start_game(self):
+        if len(self.players) < 4:
+            return False
+        rng = self.rng('deal')
+        players_list = list(self.players.values())
+        rng.shuffle(players_list)
+        num = len(players_list)
+        num_mafia = max(1, num // 3)
+
+        roles_pool = []
+        for i in range(num_mafia):
+            roles_pool.append(Role.DON if i == 0 else Role.MAFIA)
+        unique_roles = [r for r in ALL_ROLES if r not in (Role.MAFIA, Role.DON, Role.CIVILIAN)]
+        rng.shuffle(unique_roles)
+        for r in unique_roles:
+            if len(roles_pool) < num:
+                roles_pool.append(r)
+        while len(roles_pool) < num:
+            roles_pool.append(Role.CIVILIAN)
+        rng.shuffle(roles_pool)
+
+        self.role_masks = [0] * len(Role)
+        for p, role in zip(players_list, roles_pool):
+            p.role = role
+            self.role_masks[role] |= 1 << p.seat
+            self._index_player(p)
+        self.phase = 'night'
+        if self.events is not None:
+            self.events([self.seed, 'deal', [None if p is None else int(p.role) for p in self.seats]])
+        return True
+
+    def begin_night(self):
+        self.phase = 'night'
+        self.night_actions = {}
+        if self.events is not None:
+            self.events([self.seed, 'night'])
+
+    def begin_day(self):
+        self.phase = 'day'
+        self.reset_votes()
+        if self.events is not None:
+            self.events([self.seed, 'day'])
+
+    def alive_players(self, exclude=None):
+        # Живых обычно большинство: обход игроков быстрее разбора плотной маски
+        return [uid for uid, p in self.players.items() if p.alive and uid != exclude]
+
+    def get_players_by_role(self, role, alive_only=True):
+        mask = self.role_masks[role]
+        if alive_only:
+            mask &= self.alive_mask
+        return self._uids(mask)
+
+    def can_act(self, user_id):
+        """Есть ли у игрока ночной ход (у одноразовых ролей — пока он не использован)."""
+        action = NIGHT_ACTIONS.get(self.players[user_id].role)
+        return action is not None and not (action.once and user_id in self.used_once)
+
+    def set_night_action(self, actor_id, target_id):
+        """Записывает ночной ход игрока; False, если у его роли нет (или уже не осталось) хода."""
+        if not self.can_act(actor_id):
+            return False
+        self.night_actions[actor_id] = target_id
+        if self.events is not None:
+            self.events([self.seed, 'act', actor_id, target_id])
+        return True
+
+    def resolve_night(self):
+        """Разрешает ходы ночи за один проход по таблице NIGHT_ACTIONS. Возвращает список погибших."""
+        players = self.players
+        moves = []
+        for actor, target in self.night_actions.items():
+            p = players.get(actor)
+            if p is not None and p.alive and target in players:
+                action = NIGHT_ACTIONS[p.role]
+                moves.append((action.priority, actor, target, p.role, action))
+        moves.sort(key=itemgetter(0))
+
+        blocked = set()
+        protected = set()
+        guards = {}
+        attacks = []  # (цель, роль нападающего)
+        team_votes = {}
+        killed = set()
+        self.inspections = []
+        for _, actor, target, role, action in moves:
+            if actor in blocked:
+                continue
+            effect = action.effect
+            if action.once:
+                self.used_once.add(actor)
+            if effect == BLOCK:
+                blocked.add(target)
+            elif effect == PROTECT:
+                protected.add(target)
+            elif effect == GUARD:
+                guards[target] = actor
+            elif effect == INSPECT:
+                self.inspections.append((actor, target))
+            elif effect == KILL:
+                if action.team:
+                    team_votes[target] = team_votes.get(target, 0) + 1
+                else:
+                    attacks.append((target, role))
+            elif effect == SACRIFICE:
+                attacks.append((target, role))
+                killed.add(actor)
+        if team_votes:
+            # При равенстве голосов побеждает цель, выбранная последней
+            target = max(reversed(list(team_votes)), key=team_votes.get)
+            attacks.append((target, Role.MAFIA))
+
+        for target, attacker in attacks:
+            if target in blocked or target in protected:
+                continue
+            immune = IMMUNE_TO.get(players[target].role, ())
+            if immune is None or attacker in immune:
+                continue
+            guard = guards.get(target)
+            killed.add(guard if guard is not None else target)
+
+        if not self.yakuza_avenged:
+            for uid in killed:
+                if players[uid].role == Role.YAKUZA:
+                    self.yakuza_avenged = True
+                    mafia = self._uids((self.role_masks[Role.MAFIA] | self.role_masks[Role.DON]) & self.alive_mask)
+                    mafia = [m for m in mafia if m not in killed]
+                    if mafia:
+                        killed.add(self.rng(f'night{self.nights}').choice(mafia))
+                    break
+        self.nights += 1
+        killed = list(killed)
+        if self.events is not None:
+            self.events([self.seed, 'resolve', killed])
+        return killed
+
+    def reset_votes(self):
+        self.day_votes = {}
+        self.vote_counts = {}
+        self.vote_leader = None
+        self.vote_top = 0
+
+    def cast_vote(self, voter, target):
+        """Учитывает голос или его смену, обновляя счёт и лидера. False — голос не изменился."""
+        previous = self.day_votes.get(voter)
+        if previous == target:
+            return False
+        self.day_votes[voter] = target
+        if self.events is not None:
+            self.events([self.seed, 'vote', voter, target])
+        counts = self.vote_counts
+        rescan = False
+        if previous is not None:
+            # Лидер (или один из делящих первое место) потерял голос — пересчитываем ниже
+            rescan = counts[previous] == self.vote_top
+            counts[previous] -= 1
+            if not counts[previous]:
+                del counts[previous]
+        count = counts[target] = counts.get(target, 0) + 1
+        if rescan:
+            self._rescan_leader()
+        elif count > self.vote_top:
+            self.vote_leader, self.vote_top = target, count
+        elif count == self.vote_top:
+            self.vote_leader = None
+        return True
+
+    def _rescan_leader(self):
+        top = max(self.vote_counts.values(), default=0)
+        leaders = [uid for uid, c in self.vote_counts.items() if c == top]
+        self.vote_top = top
+        self.vote_leader = leaders[0] if len(leaders) == 1 else None
+
+    def vote_decided(self):
+        """True, если за лидера уже строгое большинство живых и оставшиеся голоса ничего не изменят."""
+        return self.vote_leader is not None and self.vote_top * 2 > bin(self.alive_mask).count('1')
+
+    def resolve_day(self):
+        """Подводит итог голосования: user_id исключённого или None (никто не голосовал или ничья)."""
+        return self.vote_leader
+
+    def apply_deaths(self, killed_ids):
+        dead_names = []
+        dead = []
+        for uid in killed_ids:
+            p = self.players.get(uid)
+            if p is not None and p.alive:
+                p.alive = False
+                self.alive_mask &= ~(1 << p.seat)
+                self._index_player(p)
+                dead_names.append(p.name)
+                dead.append(uid)
+        if dead:
+            self.generation += 1
+            if self.events is not None:
+                self.events([self.seed, 'death', dead])
+        return dead_names
+
+    def seat_target(self, generation, seat):
+        """user_id живого игрока на месте seat или None, если кнопка выдана для другого состава."""
+        if generation != self.generation or not 0 <= seat < len(self.seats):
+            return None
+        p = self.seats[seat]
+        if p is None or not p.alive:
+            return None
+        return p.user_id
+
+    def check_winner(self):
+        alive = self.alive_mask
+        if not alive:
+            return 'никто'
+        masks = self.role_masks
+        mafia = (masks[Role.MAFIA] | masks[Role.DON]) & alive
+        maniac = masks[Role.MANIAC] & alive
+        werewolf = masks[Role.WEREWOLF] & alive
+        peaceful = alive & ~(mafia | maniac | werewolf)
+        if not mafia and not maniac and not werewolf:
+            return 'мирные'
+        if not peaceful and not maniac and not werewolf:
+            return 'мафия'
+        if not peaceful and not mafia and not werewolf:
+            return 'маньяк'
+        if not peaceful and not mafia and not maniac:
+            return 'оборотень'
+        return None
+
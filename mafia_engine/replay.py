@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""Восстановление игр из журнала событий (см. eventlog.py).
+
+Replayer применяет события к новым MafiaGame теми же методами, что и живая игра.
+Раздача ролей и ночная случайность зависят только от seed, поэтому при проверке
+раздача и итоги ночей должны совпасть с записанными — иначе ReplayError.
+
+    python -m mafia_engine.replay mafia_events.jsonl
+    python -m mafia_engine.replay mafia_events.jsonl --game 123456789
+"""
+
+import argparse
+import time
+
+from .eventlog import read_events
+from .game import MafiaGame
+
+
+class ReplayError(Exception):
+    pass
+
+
+class Replayer:
+    """Скармливайте события в feed(); незавершённые игры лежат в games (seed -> MafiaGame).
+
+    on_end(game, winner) вызывается для каждой завершённой игры до того, как она забыта.
+    """
+
+    def __init__(self, verify=True, on_end=None):
+        self.verify = verify
+        self.on_end = on_end
+        self.games = {}
+        self.events = 0
+        self.finished = 0
+
+    def feed(self, event):
+        seed, kind, *args = event
+        self.events += 1
+        if kind == 'new':
+            self.games[seed] = MafiaGame(args[0], args[1], seed)
+            return
+        game = self.games.get(seed)
+        if game is None:
+            raise ReplayError(f"событие {kind} для неизвестной игры {seed}")
+        if kind == 'join':
+            game.add_player(*args)
+        elif kind == 'leave':
+            game.remove_player(*args)
+        elif kind == 'deal':
+            if not game.start_game():
+                raise ReplayError(f"раздача ролей для игры {game.chat_id} не удалась")
+            if self.verify and [None if p is None else int(p.role) for p in game.seats] != args[0]:
+                raise ReplayError(f"игра {seed}: раздача ролей не совпала с журналом")
+        elif kind == 'night':
+            game.begin_night()
+        elif kind == 'act':
+            game.set_night_action(*args)
+        elif kind == 'resolve':
+            killed = game.resolve_night()
+            if self.verify and sorted(killed) != sorted(args[0]):
+                raise ReplayError(f"игра {seed}: итог ночи {game.nights} не совпал с журналом")
+        elif kind == 'day':
+            game.begin_day()
+        elif kind == 'vote':
+            game.cast_vote(*args)
+        elif kind == 'death':
+            game.apply_deaths(args[0])
+        elif kind == 'end':
+            winner = args[0]
+            if self.verify and winner is not None and game.check_winner() != winner:
+                raise ReplayError(f"игра {seed}: победитель не совпал с журналом")
+            del self.games[seed]
+            self.finished += 1
+            if self.on_end:
+                self.on_end(game, winner)
+            game.release()
+        else:
+            raise ReplayError(f"неизвестное событие {kind}")
+
+    def feed_all(self, events):
+        for event in events:
+            self.feed(event)
+        return self
+
+
+def replay_game(path, seed, verify=True):
+    """Состояние одной игры после всех её событий в журнале (или None, если игры там нет)."""
+    result = []
+    replayer = Replayer(verify, on_end=lambda game, winner: game.seed == seed and result.append(game))
+    for event in read_events(path):
+        if event[0] == seed:
+            replayer.feed(event)
+    return result[0] if result else replayer.games.get(seed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Восстановление игр из журнала событий")
+    parser.add_argument('path')
+    parser.add_argument('--game', type=int, help="показать состояние одной игры (её seed)")
+    parser.add_argument('--no-verify', action='store_true', help="не сверять раздачу и итоги ночей")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    if args.game is not None:
+        game = replay_game(args.path, args.game, not args.no_verify)
+        if game is None:
+            print("игры с таким seed в журнале нет")
+            return
+        print(f"чат {game.chat_id}, фаза {game.phase}, ночей {game.nights}")
+        for p in game.seats:
+            if p is not None:
+                role = p.role.label if p.role is not None else '—'
+                print(f"  {p.name}: {role}{'' if p.alive else ' (мёртв)'}")
+        return
+    replayer = Replayer(not args.no_verify).feed_all(read_events(args.path))
+    elapsed = time.perf_counter() - started
+    print(f"событий: {replayer.events}, завершённых игр: {replayer.finished}, незавершённых: {len(replayer.games)}")
+    print(f"за {elapsed:.2f} с ({replayer.events / elapsed:.0f} событий/с)")
+
+
+if __name__ == '__main__':
+    main()
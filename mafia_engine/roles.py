@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Роли Мафии: перечисление и таблицы, общие для движка и бота."""
+
+from collections import namedtuple
+from enum import IntEnum
+
+
+class Role(IntEnum):
+    MAFIA = 0
+    DON = 1
+    COMMISSAR = 2
+    DOCTOR = 3
+    LOVER = 4
+    MANIAC = 5
+    LAWYER = 6
+    SHERIFF = 7
+    YAKUZA = 8
+    HOOKER = 9
+    THIEF = 10
+    HOMELESS = 11
+    SANTA = 12
+    SUICIDE = 13
+    BODYGUARD = 14
+    SNIPER = 15
+    JOURNALIST = 16
+    IMMORTAL = 17
+    WEREWOLF = 18
+    CIVILIAN = 19
+
+    @property
+    def label(self):
+        return ROLE_NAMES[self]
+
+ROLE_NAMES = (
+    'мафия', 'дон', 'комиссар', 'доктор', 'любовница', 'маньяк',
+    'адвокат', 'шериф', 'якудза', 'путана', 'вор', 'бомж',
+    'дед мороз', 'самоубийца', 'телохранитель', 'снайпер',
+    'журналист', 'бессмертный', 'оборотень', 'мирный'
+)
+
+ALL_ROLES = list(Role)
+
+MAFIA_ROLES = (Role.MAFIA, Role.DON)
+
+# ===== НОЧНЫЕ ДЕЙСТВИЯ =====
+# Ходы разрешаются по возрастанию priority. Заблокированный игрок не действует
+# и не бывает дома, поэтому покушения на него тоже срываются.
+BLOCK = 'block'      # цель не действует этой ночью
+PROTECT = 'protect'  # покушения на цель не удаются
+GUARD = 'guard'      # при покушении на цель вместо неё гибнет сам телохранитель
+INSPECT = 'inspect'  # игрок узнаёт что-то о цели (см. MafiaGame.inspections)
+KILL = 'kill'        # покушение на цель
+SACRIFICE = 'sacrifice'  # покушение на цель, а сам игрок гибнет наверняка
+
+# team: ходы всех живых членов команды сводятся в один (цель — большинством голосов)
+# once: действие можно совершить один раз за игру
+NightAction = namedtuple('NightAction', 'priority effect team once', defaults=(False, False))
+
+NIGHT_ACTIONS = {
+    Role.LOVER: NightAction(10, BLOCK),
+    Role.HOOKER: NightAction(10, BLOCK),
+    Role.THIEF: NightAction(20, BLOCK),
+    Role.DOCTOR: NightAction(30, PROTECT),
+    Role.SANTA: NightAction(30, PROTECT),
+    Role.BODYGUARD: NightAction(30, GUARD),
+    Role.COMMISSAR: NightAction(40, INSPECT),
+    Role.DON: NightAction(40, INSPECT),
+    Role.JOURNALIST: NightAction(40, INSPECT),
+    Role.MAFIA: NightAction(50, KILL, team=True),
+    Role.MANIAC: NightAction(50, KILL),
+    Role.WEREWOLF: NightAction(50, KILL),
+    Role.SNIPER: NightAction(50, KILL, once=True),
+    Role.SUICIDE: NightAction(50, SACRIFICE),
+}
+
+# Роли цели, которые переживают покушения: роль -> чьи покушения не действуют (None — ничьи)
+IMMUNE_TO = {
+    Role.HOMELESS: MAFIA_ROLES,
+    Role.IMMORTAL: None,
+}
+
+NIGHT_ROLES = [role for role in Role if role in NIGHT_ACTIONS]
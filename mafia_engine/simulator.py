@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""Безголовый симулятор: играет партии MafiaGame без Telegram.
+
+Политика — функция (game, user_id, role, targets, rng) -> user_id цели.
+Ночью её спрашивают за каждого живого игрока с ночной ролью, днём — за каждого
+живого игрока (role=None). Запуск из консоли:
+
+    python -m mafia_engine.simulator --games 100000 --seed 1 --processes 4
+    python -m mafia_engine.simulator --games 1000 --log sim.jsonl.gz   # журнал для replay.py
+
+Прогон с тем же --seed повторяется партия в партию: seed каждой игры берётся из rng прогона.
+"""
+
+import argparse
+import random
+import time
+from collections import Counter
+from multiprocessing import Pool
+
+from .eventlog import EventLog, part_path
+from .game import MafiaGame
+from .roles import MAFIA_ROLES, NIGHT_ROLES
+
+MAX_ROUNDS = 50
+
+
+def random_policy(game, user_id, role, targets, rng):
+    return rng.choice(targets)
+
+
+def team_policy(game, user_id, role, targets, rng):
+    """Мафия не стреляет и не голосует в своих, остальные ходят случайно."""
+    if game.players[user_id].role in MAFIA_ROLES:
+        outsiders = [uid for uid in targets if game.players[uid].role not in MAFIA_ROLES]
+        if outsiders:
+            return rng.choice(outsiders)
+    return rng.choice(targets)
+
+
+POLICIES = {
+    'random': random_policy,
+    'team': team_policy,
+}
+
+
+def play_night(game, policy, rng):
+    game.begin_night()
+    for role in NIGHT_ROLES:
+        for uid in game.get_players_by_role(role):
+            targets = game.alive_players(exclude=uid)
+            if targets:
+                game.set_night_action(uid, policy(game, uid, role, targets, rng))
+    game.apply_deaths(game.resolve_night())
+
+
+def play_day(game, policy, rng):
+    game.begin_day()
+    alive = game.alive_players()
+    for uid in alive:
+        targets = [t for t in alive if t != uid]
+        if targets:
+            game.cast_vote(uid, policy(game, uid, None, targets, rng))
+    executed = game.resolve_day()
+    if executed is not None:
+        game.apply_deaths([executed])
+
+
+def play_game(num_players, policy=random_policy, rng=None, chat_id=-1, events=None):
+    """Играет одну партию до победы (или MAX_ROUNDS кругов). Возвращает (победитель, кругов)."""
+    rng = rng or random
+    game = MafiaGame(chat_id, 1, rng.getrandbits(63), events)
+    for uid in range(1, num_players + 1):
+        game.add_player(uid, f'bot{uid}')
+    game.start_game()
+    winner = None
+    rounds = 0
+    try:
+        while rounds < MAX_ROUNDS:
+            rounds += 1
+            play_night(game, policy, rng)
+            winner = game.check_winner()
+            if winner:
+                break
+            play_day(game, policy, rng)
+            winner = game.check_winner()
+            if winner:
+                break
+    finally:
+        game.finish(winner)
+    return winner, rounds
+
+
+def simulate(games, min_players=4, max_players=20, policy='random', seed=None, log=None):
+    """Играет games партий подряд и возвращает Counter победителей (None — ничья по лимиту кругов).
+
+    log — путь журнала событий (см. eventlog.py), куда дописываются все партии прогона.
+    """
+    rng = random.Random(seed)
+    policy = POLICIES[policy]
+    events = EventLog(log) if log else None
+    results = Counter()
+    try:
+        for _ in range(games):
+            winner, _ = play_game(rng.randint(min_players, max_players), policy, rng, events=events)
+            results[winner] += 1
+    finally:
+        if events is not None:
+            events.close()
+    return results
+
+
+def _simulate_chunk(args):
+    return simulate(*args)
+
+
+def simulate_parallel(games, processes, min_players=4, max_players=20, policy='random', seed=0, log=None):
+    """Делит прогон на processes кусков с разными сидами и считает их в пуле процессов."""
+    chunk = games // processes
+    jobs = [(chunk + (1 if i < games % processes else 0), min_players, max_players, policy, seed + i,
+             part_path(log, i) if log else None)
+            for i in range(processes)]
+    results = Counter()
+    with Pool(processes) as pool:
+        for part in pool.imap_unordered(_simulate_chunk, jobs):
+            results.update(part)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Симуляция партий Мафии без Telegram")
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--min-players', type=int, default=4)
+    parser.add_argument('--max-players', type=int, default=20)
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='random')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--log', help="журнал событий (.jsonl или .jsonl.gz); при --processes N — по файлу на процесс")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    if args.processes > 1:
+        results = simulate_parallel(args.games, args.processes, args.min_players, args.max_players,
+                                    args.policy, args.seed, args.log)
+    else:
+        results = simulate(args.games, args.min_players, args.max_players, args.policy, args.seed, args.log)
+    elapsed = time.perf_counter() - started
+
+    for winner, count in results.most_common():
+        print(f"{winner or 'без победителя'}: {count} ({count / args.games:.1%})")
+    print(f"{args.games} партий за {elapsed:.2f} с ({args.games / elapsed:.0f} партий/с)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Шардированный запуск: один ingress-процесс и N воркеров с играми.
+
+Ingress получает апдейты (long polling или фейковый источник) и отправляет
+каждый воркеру, который владеет игрой: групповые апдейты — по chat_id,
+личные (ночные кнопки, !м) — по карте user_id -> шард. Воркеры сообщают
+ingress'у, когда игрок входит в игру или выходит из неё.
+
+Индекс игроков у каждого воркера знает только свой шард, поэтому правило «одна
+игра на игрока» для игр разных шардов держит ingress: /game и /join игрока, чья
+игра идёт на другом шарде, до воркеров не доходят — воркер чата только отвечает отказом.
+
+    python sharding.py --shards 4                      # боевой режим, polling
+    python sharding.py --shards 4 --fake-chats 200     # локальная проверка без Telegram
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import time
+
+log = logging.getLogger('mafia.sharding')
+
+UPDATE_QUEUE_SIZE = 10000
+JOIN_COMMANDS = ('/game', '/join')
+
+
+class ShardRouter:
+    """Выбирает шард для апдейта в формате Bot API (dict)."""
+
+    def __init__(self, shards):
+        self.shards = shards
+        self.user_shards = {}  # user_id -> шард, где идёт его игра
+
+    def shard_for_chat(self, chat_id):
+        return chat_id % self.shards
+
+    def bind(self, user_id, shard):
+        self.user_shards[user_id] = shard
+
+    def unbind(self, user_id, shard):
+        # Игрок мог уже перейти в игру другого шарда: тогда старое "unbind" игнорируем
+        if self.user_shards.get(user_id) == shard:
+            del self.user_shards[user_id]
+
+    def _private(self, user_id):
+        shard = self.user_shards.get(user_id)
+        return shard if shard is not None else self.shard_for_chat(user_id)
+
+    def rejected_chat(self, update):
+        """Группа, где /game или /join игрока отклоняется, потому что его игра идёт на другом шарде (или None)."""
+        message = update.get('message')
+        if not message or message['chat']['type'] == 'private' or 'from' not in message:
+            return None
+        words = (message.get('text') or '').split()
+        if not words or words[0].split('@')[0] not in JOIN_COMMANDS:
+            return None
+        chat_id = message['chat']['id']
+        shard = self.user_shards.get(message['from']['id'])
+        return chat_id if shard is not None and shard != self.shard_for_chat(chat_id) else None
+
+    def route(self, update):
+        message = update.get('message') or update.get('edited_message')
+        if message:
+            chat = message['chat']
+            if chat['type'] == 'private':
+                return self._private(message['from']['id'])
+            return self.shard_for_chat(chat['id'])
+        callback = update.get('callback_query')
+        if callback:
+            message = callback.get('message')
+            if message and message['chat']['type'] != 'private':
+                return self.shard_for_chat(message['chat']['id'])
+            return self._private(callback['from']['id'])
+        for value in update.values():
+            if isinstance(value, dict) and 'chat' in value:
+                return self.shard_for_chat(value['chat']['id'])
+        return 0
+
+
+# ===== ВОРКЕР =====
+
+def _dry_run_bot(token):
+    """Bot, который ничего не отправляет в Telegram, а отвечает правдоподобными заглушками."""
+    from aiogram import Bot
+
+    class DryRunBot(Bot):
+        message_id = 0
+
+        async def request(self, method, data=None, files=None, **kwargs):
+            if method == 'sendMessage':
+                DryRunBot.message_id += 1
+                chat_id = int(data['chat_id'])
+                return {'message_id': DryRunBot.message_id, 'date': int(time.time()), 'text': data.get('text'),
+                        'chat': {'id': chat_id, 'type': 'private' if chat_id > 0 else 'group'}}
+            return True
+
+    return DryRunBot(token)
+
+
+def worker_main(shard, shards, updates, control, dry_run):
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    from mafia_bot import config, handlers
+    from mafia_bot.app import create_app
+    from mafia_engine import player_index
+    from mafia_engine.eventlog import part_path
+
+    if dry_run:
+        # Сообщения никуда не уходят, так что и лимиты Telegram не нужны
+        config.GROUP_RATE = config.GROUP_BURST = config.PRIVATE_RATE = config.PRIVATE_BURST = config.GLOBAL_RATE = 1e6
+    # Лимит Telegram общий на бота: делим его между шардами
+    config.GLOBAL_RATE = config.GLOBAL_RATE / shards
+    # У каждого шарда свой /metrics: порты METRICS_PORT, METRICS_PORT + 1, ...
+    if config.METRICS_PORT:
+        config.METRICS_PORT += shard
+    # И свой журнал событий: дописывать один файл из нескольких процессов нельзя
+    if config.EVENT_LOG_PATH:
+        config.EVENT_LOG_PATH = part_path(config.EVENT_LOG_PATH, shard)
+    dp = create_app(bot=_dry_run_bot('1:dry-run') if dry_run else None)
+
+    def on_index_change(user_id, chat_id):
+        control.put(('bind' if chat_id is not None else 'unbind', user_id, shard))
+
+    player_index.listener = on_index_change
+    asyncio.run(_serve(dp, handlers, shard, shards, updates, control))
+
+
+async def _serve(dp, handlers, shard, shards, updates, control):
+    from aiogram import Bot, Dispatcher, types
+
+    Bot.set_current(dp.bot)
+    Dispatcher.set_current(dp)
+    await handlers.start_services(owns=lambda chat_id: chat_id % shards == shard)
+    control.put(('ready', shard))
+    loop = asyncio.get_event_loop()
+    processed = 0
+    private = 0
+    rejected = 0
+    foreign = 0  # личные апдейты от игроков, чьей игры на этом шарде нет
+    tasks = set()
+    while True:
+        data = await loop.run_in_executor(None, updates.get)
+        if data is None:
+            break
+        if isinstance(data, tuple):
+            # ('reject', chat_id): ingress не пустил /game или /join игрока из игры другого шарда
+            rejected += 1
+            handlers.sender.send_message(data[1], handlers.PLAYS_ELSEWHERE)
+            continue
+        processed += 1
+        source = data.get('callback_query') or data.get('message') or {}
+        chat = (source.get('message') or source).get('chat', {})
+        if chat.get('type') == 'private':
+            private += 1
+            if source['from']['id'] not in handlers.player_index:
+                foreign += 1
+        task = loop.create_task(dp.process_update(types.Update(**data)))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+    await handlers.stop_services(dp)
+    control.put(('stats', shard, {'processed': processed, 'private': private, 'foreign': foreign,
+                                  'rejected': rejected, 'games': len(handlers.games)}))
+
+
+# ===== INGRESS =====
+
+async def polling_source(token):
+    """Апдейты Telegram через getUpdates в виде dict'ов Bot API."""
+    from aiogram import Bot
+    bot = Bot(token)
+    await bot.delete_webhook()
+    offset = None
+    try:
+        while True:
+            for update in await bot.get_updates(offset=offset, timeout=20):
+                offset = update.update_id + 1
+                yield update.to_python()
+    finally:
+        await (await bot.get_session()).close()
+
+
+async def fake_source(router, chats, players=8, timeout=30):
+    """Синтетические апдейты: chats групп создают игры, игроки жмут кнопки и пишут в !м."""
+    update_id = 0
+
+    def user(uid):
+        return {'id': uid, 'is_bot': False, 'first_name': f'u{uid}'}
+
+    def message(chat_id, chat_type, uid, text):
+        nonlocal update_id
+        update_id += 1
+        entities = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}] if text[0] == '/' else []
+        return {'update_id': update_id, 'message': {
+            'message_id': update_id, 'date': int(time.time()), 'text': text, 'entities': entities,
+            'chat': {'id': chat_id, 'type': chat_type}, 'from': user(uid)}}
+
+    def callback(uid, data):
+        nonlocal update_id
+        update_id += 1
+        return {'update_id': update_id, 'callback_query': {
+            'id': str(update_id), 'chat_instance': str(uid), 'data': data, 'from': user(uid),
+            'message': {'message_id': update_id, 'date': int(time.time()), 'chat': {'id': uid, 'type': 'private'}}}}
+
+    groups = [-1000000 - i for i in range(chats)]
+    members = {chat_id: [(i + 1) * 1000 + p for p in range(players)] for i, chat_id in enumerate(groups)}
+    for chat_id in groups:
+        creator = members[chat_id][0]
+        yield message(chat_id, 'group', creator, '/game')
+        for uid in members[chat_id][1:]:
+            yield message(chat_id, 'group', uid, '/join')
+        yield message(chat_id, 'group', creator, '/start_mafia')
+    # Ждём, пока воркеры сообщат ingress'у, где чьи игроки
+    expected = sum(len(uids) for uids in members.values())
+    deadline = time.monotonic() + timeout
+    while len(router.user_shards) < expected and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    if len(groups) > 1:
+        # Игрок первой игры пробует войти во вторую: с несколькими шардами его останавливает ingress
+        yield message(groups[1], 'group', members[groups[0]][0], '/join')
+    for chat_id in groups:
+        uids = members[chat_id]
+        for uid in uids:
+            yield callback(uid, f'n:0:{0 if uid != uids[0] else 1}')
+            yield message(uid, 'private', uid, '!м привет')
+
+
+async def ingress(router, source, queues, control, stats):
+    ready = set()
+
+    def drain_control():
+        while True:
+            try:
+                kind, *payload = control.get_nowait()
+            except queue.Empty:
+                return
+            if kind == 'bind':
+                router.bind(*payload)
+            elif kind == 'unbind':
+                router.unbind(*payload)
+            elif kind == 'ready':
+                ready.add(payload[0])
+            elif kind == 'stats':
+                stats[payload[0]] = payload[1]
+
+    async def drain_forever():
+        # Источник может подолгу ждать новых апдейтов, а привязки игроков должны доходить сразу
+        while True:
+            drain_control()
+            await asyncio.sleep(0.01)
+
+    drainer = asyncio.get_event_loop().create_task(drain_forever())
+    # Пока воркеры не восстановили свои игры, карта игроков неполная
+    while len(ready) < len(queues):
+        await asyncio.sleep(0.05)
+    async for update in source:
+        drain_control()
+        chat_id = router.rejected_chat(update)
+        if chat_id is not None:
+            update = ('reject', chat_id)
+            target = queues[router.shard_for_chat(chat_id)]
+        else:
+            target = queues[router.route(update)]
+        while True:
+            try:
+                target.put_nowait(update)
+                break
+            except queue.Full:
+                # Воркер не успевает: притормаживаем приём апдейтов
+                await asyncio.sleep(0.01)
+    for q in queues:
+        q.put(None)
+    while len(stats) < len(queues):
+        await asyncio.sleep(0.05)
+    drainer.cancel()
+
+
+def run_sharded(shards, make_source, dry_run=False):
+    """Запускает воркеры и ingress; make_source(router) возвращает асинхронный поток апдейтов."""
+    ctx = multiprocessing.get_context('spawn')
+    queues = [ctx.Queue(UPDATE_QUEUE_SIZE) for _ in range(shards)]
+    control = ctx.Queue()
+    workers = [ctx.Process(target=worker_main, args=(i, shards, queues[i], control, dry_run), daemon=True)
+               for i in range(shards)]
+    for w in workers:
+        w.start()
+    router = ShardRouter(shards)
+    stats = {}
+    try:
+        asyncio.run(ingress(router, make_source(router), queues, control, stats))
+    finally:
+        for w in workers:
+            w.join(timeout=10)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shards', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--fake-chats', type=int, default=0,
+                        help="вместо Telegram прогнать столько синтетических игр (без отправки сообщений)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+
+    if args.fake_chats:
+        os.environ.setdefault('STORE_PATH', '')
+        started = time.perf_counter()
+        stats = run_sharded(args.shards, lambda router: fake_source(router, args.fake_chats), dry_run=True)
+        elapsed = time.perf_counter() - started
+        for shard in sorted(stats):
+            print(f"шард {shard}: {stats[shard]}")
+        total = sum(s['processed'] for s in stats.values())
+        foreign = sum(s['foreign'] for s in stats.values())
+        print(f"апдейтов: {total} за {elapsed:.2f} с, личных не на своём шарде: {foreign}")
+        sys.exit(1 if foreign else 0)
+
+    token = os.getenv('BOT_TOKEN')
+    if not token:
+        print("❌ Ошибка: переменная окружения BOT_TOKEN не задана!", file=sys.stderr)
+        sys.exit(1)
+    run_sharded(args.shards, lambda router: polling_source(token))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mafia_engine import MafiaGame, player_index  # noqa: E402
+
+
+@pytest.fixture
+def deal():
+    """deal(роль, роль, ...) -> игра в фазе ночи, где у игрока user_id = место + 1 нужная роль."""
+    games = []
+
+    def make(*roles):
+        game = MafiaGame(-1, 1, seed=1)
+        for uid in range(1, len(roles) + 1):
+            game.add_player(uid, f'p{uid}')
+        for p, role in zip(game.seats, roles):
+            p.role = role
+            game.role_masks[role] |= 1 << p.seat
+        game.phase = 'night'
+        games.append(game)
+        return game
+
+    yield make
+    for game in games:
+        game.release()
+    player_index.clear()
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""Журнал, поделённый на куски по байтам, считается так же, как целиком."""
+
+import random
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from mafia_engine import EventLog, analytics  # noqa: E402
+from mafia_engine.simulator import POLICIES, play_game  # noqa: E402
+
+COUNTERS = ('outcomes', 'role_games', 'role_wins', 'seat_games', 'seat_wins', 'presence')
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    path = str(tmp_path / 'events.jsonl')
+    events = EventLog(path)
+    rng = random.Random(1)
+    for _ in range(60):
+        play_game(rng.randint(4, 12), POLICIES['random'], rng, events=events)
+    events.close()
+    return path
+
+
+@pytest.mark.parametrize('parts', [2, 7, 100])
+def test_split_log_matches_whole(log_path, monkeypatch, parts):
+    whole = analytics.collect(analytics.log_jobs(log_path))
+    monkeypatch.setattr(analytics, 'MIN_SPAN', 1)
+    jobs = analytics.log_jobs(log_path, parts=parts)
+    assert len(jobs) == parts
+    split = analytics.collect(jobs)
+    assert split.games == whole.games == 60
+    for name in COUNTERS:
+        assert (getattr(split, name) == getattr(whole, name)).all(), name
+
+
+def test_small_log_stays_whole(log_path):
+    assert analytics.log_jobs(log_path, parts=8) == [('log', (log_path, analytics.CHUNK, None))]
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""Журнал событий игры, которую по очереди меняют две реплики с общим Redis."""
+
+import asyncio
+
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+
+from mafia_bot.storage import RedisGameStore, export_events  # noqa: E402
+from mafia_engine import MafiaGame, read_events  # noqa: E402
+from mafia_engine.replay import Replayer  # noqa: E402
+
+
+async def play_on_two_replicas(path):
+    server = fakeredis.FakeServer()
+    replicas = [RedisGameStore(fakeredis.aioredis.FakeRedis(server=server)) for _ in range(2)]
+    local = [None, None]  # копия игры на каждой реплике, как games в handlers
+    steps = [lambda g: [g.add_player(uid, f'p{uid}') for uid in range(2, 7)],
+             lambda g: g.start_game(),
+             lambda g: g.begin_night(),
+             lambda g: g.resolve_night(),
+             lambda g: g.begin_day(),
+             lambda g: g.finish(g.check_winner())]
+    # Каждый шаг — команда на другой реплике: она берёт замок и перечитывает игру
+    # (если её изменила другая; неизменившийся снимок хранилище не перезаписывает)
+    for i, step in enumerate([None] + steps):
+        store = replicas[i % 2]
+        fresh, data = await store.acquire(-1)
+        if fresh:
+            if local[i % 2] is not None:
+                local[i % 2].release()
+            local[i % 2] = MafiaGame.from_dict(data, store.events)
+        if step is None:
+            local[i % 2] = MafiaGame(-1, 1, seed=7, events=store.events)
+            local[i % 2].add_player(1, 'p1')
+        else:
+            step(local[i % 2])
+        store.save(local[i % 2])
+        await store.release(-1)
+    for game in local:
+        game.release()
+    await export_events(replicas[0].redis, path, trim=True)
+    assert await replicas[0].redis.xlen('mafia:events') == 0
+    for store in replicas:
+        await store.close()
+
+
+def test_events_of_one_game_stay_in_order(tmp_path):
+    path = str(tmp_path / 'events.jsonl')
+    asyncio.run(play_on_two_replicas(path))
+    kinds = [event[1] for event in read_events(path)]
+    assert kinds[0] == 'new' and kinds[-1] == 'end'
+    replayer = Replayer().feed_all(read_events(path))
+    assert replayer.finished == 1 and not replayer.games
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Разрешение ночи по таблице NIGHT_ACTIONS."""
+
+from mafia_engine import Role
+
+R = Role
+
+
+def night(game, **actions):
+    """Ходы вида p1=3 (игрок 1 выбрал игрока 3) в порядке аргументов; возвращает погибших."""
+    for actor, target in actions.items():
+        assert game.set_night_action(int(actor[1:]), target)
+    return sorted(game.resolve_night())
+
+
+def test_mafia_kills_target(deal):
+    game = deal(R.MAFIA, R.CIVILIAN, R.CIVILIAN)
+    assert night(game, p1=2) == [2]
+
+
+def test_doctor_protects_target(deal):
+    game = deal(R.MAFIA, R.DOCTOR, R.CIVILIAN)
+    assert night(game, p1=3, p2=3) == []
+
+
+def test_blocked_actor_does_not_act(deal):
+    # Любовница ходит раньше мафии, поэтому её блок срывает убийство
+    game = deal(R.MAFIA, R.LOVER, R.CIVILIAN)
+    assert night(game, p1=3, p2=1) == []
+
+
+def test_blocked_target_is_not_home(deal):
+    game = deal(R.MANIAC, R.HOOKER, R.CIVILIAN)
+    assert night(game, p1=3, p2=3) == []
+
+
+def test_blocked_doctor_does_not_protect(deal):
+    game = deal(R.MAFIA, R.DOCTOR, R.LOVER, R.CIVILIAN)
+    assert night(game, p1=4, p2=4, p3=2) == [4]
+
+
+def test_bodyguard_dies_instead_of_target(deal):
+    game = deal(R.MAFIA, R.BODYGUARD, R.CIVILIAN)
+    assert night(game, p1=3, p2=3) == [2]
+
+
+def test_homeless_survives_mafia_but_not_maniac(deal):
+    game = deal(R.MAFIA, R.HOMELESS, R.CIVILIAN)
+    assert night(game, p1=2) == []
+    game = deal(R.MANIAC, R.HOMELESS, R.CIVILIAN)
+    assert night(game, p1=2) == [2]
+
+
+def test_immortal_survives_everyone(deal):
+    game = deal(R.MAFIA, R.MANIAC, R.SNIPER, R.IMMORTAL)
+    assert night(game, p1=4, p2=4, p3=4) == []
+
+
+def test_suicide_dies_with_target(deal):
+    game = deal(R.SUICIDE, R.CIVILIAN, R.CIVILIAN)
+    assert night(game, p1=2) == [1, 2]
+
+
+def test_mafia_majority_picks_target(deal):
+    game = deal(R.DON, R.MAFIA, R.MAFIA, R.CIVILIAN, R.CIVILIAN)
+    # Дон этой ночью проверяет, так что голосуют двое мафиози
+    game.set_night_action(1, 4)
+    assert night(game, p2=5, p3=5) == [5]
+
+
+def test_mafia_tie_goes_to_target_chosen_last(deal):
+    game = deal(R.MAFIA, R.MAFIA, R.CIVILIAN, R.CIVILIAN)
+    assert night(game, p1=3, p2=4) == [4]
+    game = deal(R.MAFIA, R.MAFIA, R.CIVILIAN, R.CIVILIAN)
+    assert night(game, p1=4, p2=3) == [3]
+
+
+def test_inspections_are_recorded(deal):
+    game = deal(R.COMMISSAR, R.MAFIA, R.CIVILIAN)
+    assert night(game, p1=2) == []
+    assert game.inspections == [(1, 2)]
+
+
+def test_sniper_shoots_once(deal):
+    game = deal(R.SNIPER, R.CIVILIAN, R.CIVILIAN, R.CIVILIAN)
+    assert night(game, p1=2) == [2]
+    game.apply_deaths([2])
+    game.begin_night()
+    assert not game.can_act(1)
+    assert not game.set_night_action(1, 3)
+    assert game.resolve_night() == []
+
+
+def test_blocked_sniper_keeps_shot(deal):
+    game = deal(R.SNIPER, R.LOVER, R.CIVILIAN)
+    assert night(game, p1=3, p2=1) == []
+    assert game.can_act(1)
+
+
+def test_yakuza_takes_a_mafioso_along_once(deal):
+    game = deal(R.MAFIA, R.MAFIA, R.YAKUZA, R.CIVILIAN, R.YAKUZA)
+    killed = night(game, p1=3, p2=3)
+    assert 3 in killed and len(killed) == 2 and set(killed) - {3} <= {1, 2}
+    assert game.yakuza_avenged
+    game.apply_deaths(killed)
+    survivor = ({1, 2} - set(killed)).pop()
+    game.begin_night()
+    assert night(game, **{f'p{survivor}': 5}) == [5]
+
+
+def test_yakuza_revenge_is_reproducible(deal):
+    results = set()
+    for _ in range(3):
+        game = deal(R.MAFIA, R.MAFIA, R.MAFIA, R.YAKUZA)
+        results.add(tuple(night(game, p1=4)))
+    assert len(results) == 1
+
+
+def test_dead_actor_is_ignored(deal):
+    game = deal(R.MAFIA, R.MANIAC, R.CIVILIAN)
+    game.set_night_action(2, 3)
+    game.apply_deaths([2])
+    assert game.resolve_night() == []
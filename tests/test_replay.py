@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""Воспроизведение журнала событий не зависит от других игр в нём."""
+
+import pytest
+
+from mafia_engine import MafiaGame
+from mafia_engine.replay import Replayer, ReplayError
+
+
+def record(chat_id, seed, uids, finish=True):
+    events = []
+    game = MafiaGame(chat_id, uids[0], seed, events.append)
+    for uid in uids:
+        game.add_player(uid, f'p{uid}')
+    game.start_game()
+    game.begin_night()
+    game.resolve_night()
+    if finish:
+        game.finish(game.check_winner())
+    else:
+        game.release()
+    return events
+
+
+def test_unfinished_game_does_not_block_next_one():
+    # Игра 11 оборвалась без end, а её игроки потом сыграли в чате 22
+    log = record(11, 1, [1, 2, 3, 4, 5], finish=False)
+    log += record(22, 2, [3, 4, 5, 6, 7])
+    replayer = Replayer().feed_all(log)
+    assert replayer.finished == 1
+    assert set(replayer.games) == {1}
+    for game in replayer.games.values():
+        game.release()
+
+
+def test_failed_deal_is_replay_error():
+    log = [[3, 'new', 33, 1], [3, 'join', 1, 'p1'], [3, 'join', 2, 'p2'], [3, 'deal', [0, 1]]]
+    with pytest.raises(ReplayError, match="раздача ролей для игры 33 не удалась"):
+        Replayer().feed_all(log)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""Очередь отправки: лимиты чатов и 429 не задерживают другие чаты и не меняют порядок."""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip('aiogram')
+
+from aiogram.utils.exceptions import RetryAfter  # noqa: E402
+
+from mafia_bot import config  # noqa: E402
+from mafia_bot.sending import SendQueue  # noqa: E402
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    """Цикл с виртуальным временем: когда делать нечего, часы перематываются к ближайшему таймеру."""
+
+    def __init__(self):
+        super().__init__()
+        self.now = 0.0
+
+    def time(self):
+        return self.now
+
+    def _run_once(self):
+        if not self._ready and self._scheduled:
+            self.now = max(self.now, self._scheduled[0]._when)
+        super()._run_once()
+
+
+class FakeBot:
+    """Записывает (время, чат, текст) каждой отправки; retry_after — чаты, где первая отправка получит 429."""
+
+    def __init__(self, retry_after=None):
+        self.retry_after = dict(retry_after or {})
+        self.sent = []
+
+    async def send_message(self, chat_id, text):
+        timeout = self.retry_after.pop(chat_id, None)
+        if timeout is not None:
+            raise RetryAfter(timeout)
+        self.sent.append((asyncio.get_event_loop().time(), chat_id, text))
+        return text
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    def set_limits(global_rate=1000, group=(20 / 60, 5), private=(1, 3)):
+        monkeypatch.setattr(config, 'GLOBAL_RATE', global_rate)
+        monkeypatch.setattr(config, 'GROUP_RATE', group[0])
+        monkeypatch.setattr(config, 'GROUP_BURST', group[1])
+        monkeypatch.setattr(config, 'PRIVATE_RATE', private[0])
+        monkeypatch.setattr(config, 'PRIVATE_BURST', private[1])
+    return set_limits
+
+
+def run(bot, messages, workers=4):
+    """Отправляет messages [(чат, текст)] через SendQueue и ждёт, пока всё уйдёт."""
+    async def main():
+        sender = SendQueue(bot, workers=workers)
+        sender.start()
+        try:
+            futures = [sender.send_message(chat_id, text) for chat_id, text in messages]
+            await asyncio.wait_for(asyncio.gather(*futures), 600)
+        finally:
+            await sender.close()
+
+    loop = VirtualClockLoop()
+    try:
+        loop.run_until_complete(main())
+    finally:
+        loop.close()
+    return bot.sent
+
+
+def times(sent, chat_id):
+    return [t for t, cid, _ in sent if cid == chat_id]
+
+
+def test_retry_after_holds_only_its_chat(limits):
+    limits()
+    sent = run(FakeBot(retry_after={-1: 30}), [(-1, 'a'), (-2, 'b'), (-2, 'c'), (5, 'd')])
+    assert times(sent, -2) == [0.0, 0.0]
+    assert times(sent, 5) == [0.0]
+    assert times(sent, -1) == [pytest.approx(30.0)]
+
+
+def test_order_kept_after_retry_after(limits):
+    limits()
+    texts = [str(i) for i in range(8)]
+    sent = run(FakeBot(retry_after={-1: 10}), [(-1, text) for text in texts])
+    assert [text for _, cid, text in sent if cid == -1] == texts
+    # Первое ушло после паузы Telegram, дальше — по лимиту группы (5 сразу, потом 1 за 3 с)
+    assert sent[0][0] == pytest.approx(10.0)
+
+
+def test_order_kept_while_chat_waits_for_tokens(limits):
+    limits(private=(1, 3))
+    texts = [str(i) for i in range(10)]
+    sent = run(FakeBot(), [(7, text) for text in texts] + [(8, 'other')])
+    assert [text for _, cid, text in sent if cid == 7] == texts
+    assert times(sent, 8) == [0.0]
+    # 3 сразу, дальше по одному в секунду
+    assert times(sent, 7) == pytest.approx([0, 0, 0, 1, 2, 3, 4, 5, 6, 7])
+
+
+def test_global_rate_holds(limits):
+    limits(global_rate=10)
+    sent = run(FakeBot(), [(uid, 'hi') for uid in range(1, 51)], workers=8)
+    stamps = sorted(t for t, _, _ in sent)
+    assert len(stamps) == 50
+    # Первые 10 — запас ведра, дальше не больше 10 в секунду
+    for i, t in enumerate(stamps):
+        assert t >= (i + 1 - 10) / 10 - 1e-9
+    assert stamps[-1] == pytest.approx(4.0)
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""Маршрутизация ingress: игрок с игрой на одном шарде не входит в игру другого."""
+
+from sharding import ShardRouter
+
+
+def command(chat_id, uid, text):
+    return {'update_id': 1, 'message': {'message_id': 1, 'date': 0, 'text': text,
+                                        'chat': {'id': chat_id, 'type': 'group'}, 'from': {'id': uid}}}
+
+
+def night_button(uid):
+    return {'update_id': 2, 'callback_query': {'id': '2', 'data': 'n:0:1', 'from': {'id': uid},
+                                               'message': {'chat': {'id': uid, 'type': 'private'}}}}
+
+
+def test_join_in_other_shard_is_rejected():
+    router = ShardRouter(2)
+    router.bind(7, router.shard_for_chat(-2))  # игрок 7 играет в чате -2 (шард 0)
+    assert router.rejected_chat(command(-1, 7, '/join')) == -1
+    assert router.rejected_chat(command(-1, 7, '/game@mafia_bot')) == -1
+    # Ночные кнопки по-прежнему идут на шард его игры
+    assert router.route(night_button(7)) == 0
+
+
+def test_same_shard_and_other_commands_pass():
+    router = ShardRouter(2)
+    router.bind(7, 0)
+    # Свой шард разбирает сам воркер по своему индексу
+    assert router.rejected_chat(command(-4, 7, '/join')) is None
+    assert router.rejected_chat(command(-1, 7, '/players')) is None
+    assert router.rejected_chat(command(-1, 8, '/join')) is None
+
+
+def test_binding_cleared_when_game_ends():
+    router = ShardRouter(2)
+    router.bind(7, 0)
+    router.unbind(7, 1)  # запоздалое сообщение от другого шарда не снимает привязку
+    assert router.rejected_chat(command(-1, 7, '/join')) == -1
+    router.unbind(7, 0)
+    assert router.rejected_chat(command(-1, 7, '/join')) is None
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""Снимок игры для хранилища: to_dict -> JSON -> from_dict ничего не теряет."""
+
+import json
+
+from mafia_engine import MafiaGame, Role
+
+
+def restore(game):
+    data = json.loads(json.dumps(game.to_dict()))
+    game.release()
+    return MafiaGame.from_dict(data)
+
+
+def test_seats_survive_a_player_leaving_mid_game(deal):
+    game = deal(Role.MAFIA, Role.DOCTOR, Role.CIVILIAN, Role.COMMISSAR, Role.CIVILIAN)
+    game.remove_player(2)  # место 1 пустеет, остальные не пересаживаются
+    game.apply_deaths([3])
+    game.set_night_action(1, 5)
+    game.set_night_action(4, 5)
+    restored = restore(game)
+    try:
+        assert [None if p is None else (p.user_id, p.role, p.alive) for p in restored.seats] == \
+            [(1, Role.MAFIA, True), None, (3, Role.CIVILIAN, False), (4, Role.COMMISSAR, True),
+             (5, Role.CIVILIAN, True)]
+        assert restored.players[5].seat == 4
+        assert restored.alive_mask == game.alive_mask
+        assert restored.role_masks == game.role_masks
+        assert restored.night_actions == {1: 5, 4: 5}
+        # Кнопка с номером места, выданная до перезапуска, указывает на того же игрока
+        assert restored.seat_target(restored.generation, 4) == game.seat_target(game.generation, 4) == 5
+    finally:
+        restored.release()
+
+
+def test_votes_and_one_shot_actions_survive(deal):
+    game = deal(Role.SNIPER, Role.MAFIA, Role.CIVILIAN, Role.CIVILIAN)
+    game.used_once.add(1)
+    game.begin_day()
+    game.cast_vote(1, 2)
+    game.cast_vote(3, 2)
+    restored = restore(game)
+    try:
+        assert restored.used_once == {1}
+        assert restored.day_votes == {1: 2, 3: 2}
+        assert (restored.vote_leader, restored.vote_top) == (2, 2)
+    finally:
+        restored.release()
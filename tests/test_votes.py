@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""Подсчёт дневного голосования по мере поступления голосов."""
+
+from mafia_engine import Role
+
+
+def day(deal, players=5):
+    game = deal(*[Role.CIVILIAN] * players)
+    game.begin_day()
+    return game
+
+
+def test_first_vote_leads(deal):
+    game = day(deal)
+    assert game.cast_vote(1, 3)
+    assert (game.vote_leader, game.vote_top) == (3, 1)
+
+
+def test_repeated_vote_changes_nothing(deal):
+    game = day(deal)
+    game.cast_vote(1, 3)
+    assert not game.cast_vote(1, 3)
+    assert game.vote_counts == {3: 1}
+
+
+def test_tie_has_no_leader(deal):
+    game = day(deal)
+    game.cast_vote(1, 3)
+    game.cast_vote(2, 4)
+    assert game.vote_leader is None
+    assert game.resolve_day() is None
+    game.cast_vote(5, 4)
+    assert game.resolve_day() == 4
+
+
+def test_changed_vote_moves_leader(deal):
+    game = day(deal)
+    game.cast_vote(1, 3)
+    game.cast_vote(2, 3)
+    game.cast_vote(4, 5)
+    assert game.vote_leader == 3
+    # Голос ушёл от лидера к другому игроку: лидер меняется
+    game.cast_vote(2, 5)
+    assert game.vote_counts == {3: 1, 5: 2}
+    assert (game.vote_leader, game.vote_top) == (5, 2)
+    game.cast_vote(4, 3)
+    assert (game.vote_leader, game.vote_top) == (3, 2)
+    game.cast_vote(1, 5)
+    assert game.vote_counts == {3: 1, 5: 2}
+    assert game.vote_leader == 5
+
+
+def test_leader_losing_vote_to_tie(deal):
+    game = day(deal)
+    game.cast_vote(1, 3)
+    game.cast_vote(2, 3)
+    game.cast_vote(4, 5)
+    game.cast_vote(2, 1)
+    assert game.vote_leader is None and game.vote_top == 1
+
+
+def test_leader_losing_all_votes_rescans(deal):
+    game = day(deal)
+    game.cast_vote(1, 3)
+    game.cast_vote(1, 4)
+    assert game.vote_counts == {4: 1}
+    assert game.vote_leader == 4
+
+
+def test_vote_decided_needs_strict_majority(deal):
+    game = day(deal, players=4)
+    game.cast_vote(1, 3)
+    game.cast_vote(2, 3)
+    assert not game.vote_decided()  # 2 из 4 — ещё не большинство
+    game.cast_vote(4, 3)
+    assert game.vote_decided()
+    game.cast_vote(4, 1)
+    assert not game.vote_decided()
+
+
+def test_majority_counts_only_the_living(deal):
+    game = day(deal, players=5)
+    game.apply_deaths([5])
+    game.cast_vote(1, 3)
+    game.cast_vote(2, 3)
+    assert not game.vote_decided()
+    game.apply_deaths([4])
+    assert game.vote_decided()
+
+
+def test_leaving_player_takes_votes_along(deal):
+    game = day(deal)
+    game.cast_vote(1, 3)
+    game.cast_vote(2, 3)
+    game.cast_vote(3, 4)
+    game.cast_vote(4, 5)
+    game.remove_player(3)
+    assert game.day_votes == {4: 5}
+    assert game.resolve_day() == 5
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""Webhook без секрета запускается только на loopback."""
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from mafia_bot import config, webhook  # noqa: E402
+
+
+@pytest.mark.parametrize('host, url', [('0.0.0.0', None), ('', None), ('bot.example.com', None),
+                                       ('127.0.0.1', 'https://example.com/webhook')])
+def test_refuses_without_secret(monkeypatch, host, url):
+    monkeypatch.setattr(config, 'WEBHOOK_SECRET', None)
+    monkeypatch.setattr(config, 'WEBHOOK_HOST', host)
+    monkeypatch.setattr(config, 'WEBHOOK_URL', url)
+    with pytest.raises(RuntimeError, match='WEBHOOK_SECRET'):
+        webhook.run_webhook(None)
+
+
+@pytest.mark.parametrize('host', ['127.0.0.1', '::1', 'localhost'])
+def test_loopback_hosts(host):
+    assert webhook.is_loopback(host)